@@ -0,0 +1,189 @@
+import functools, math, numpy as np
+
+# tout ce qui ne dépend que de (taille de la fenêtre, taux d'échantillonnage, fréquences min/max) est calculé
+# une seule fois puis réutilisé à chaque tick: axe des fréquences, bins de la bande analysée, fenêtre
+
+# https://numpy.org/doc/stable/reference/routines.window.html
+WINDOWS = {'hann': np.hanning, 'hamming': np.hamming, 'blackman': np.blackman}
+
+class AnalysisPlan:
+    def __init__(self, length, rate, min_freq, max_freq, window=None):
+        self.length = length
+        self.rate = rate
+        self.bin_width = rate / length # écart en Hz entre deux bins de la FFT
+
+        # https://numpy.org/doc/2.1/reference/generated/numpy.fft.rfftfreq.html
+        self.freqs = np.fft.rfftfreq(length, d=1/rate)
+
+        # les fréquences sont triées: le masque (freqs >= min_freq) & (freqs <= max_freq) est un intervalle
+        # contigu, qu'on remplace par une slice (une vue, sans copie ni masque booléen à chaque tick)
+        start = np.searchsorted(self.freqs, min_freq, side='left')
+        stop = np.searchsorted(self.freqs, max_freq, side='right')
+        self.band = slice(start, stop)
+        self.band_freqs = self.freqs[self.band]
+
+        # fenêtre de pondération appliquée avant la FFT (None = pas de fenêtre, comme l'analyse en direct)
+        self.window = WINDOWS[window](length) if window else None
+
+    def spectrum(self, data):
+        # module de la FFT, sur une fenêtre (1D) ou plusieurs fenêtres d'un coup (2D, une par ligne)
+        if self.window is not None:
+            data = data * self.window
+        return np.abs(np.fft.rfft(data, axis=-1))
+
+class ZoomPlan:
+    # https://en.wikipedia.org/wiki/Chirp_Z-transform#Bluestein's_algorithm
+    # transformée en Z chirp (zoom FFT): on n'évalue le spectre qu'entre min_freq et max_freq, avec un pas de
+    # 'resolution' Hz choisi librement, au lieu des rate / length Hz imposés par la FFT sur toute la bande 0 - rate / 2.
+    # même interface qu'AnalysisPlan (freqs, band, band_freqs, bin_width, spectrum) pour le reste de l'analyse
+    def __init__(self, length, rate, min_freq, max_freq, resolution=1, window=None):
+        self.length = length
+        self.rate = rate
+        self.bin_width = resolution
+        self.freqs = min_freq + resolution * np.arange(int((max_freq - min_freq) / resolution) + 1)
+        self.band = slice(0, len(self.freqs)) # tous les points calculés sont dans la bande
+        self.band_freqs = self.freqs
+
+        # X[k] = somme des x[n] * exp(-2iπ n f_k / rate), réécrit comme une convolution (algorithme de Bluestein)
+        # calculée par FFT de taille fft_size: tout ce qui ne dépend pas du signal est précalculé ici
+        n, m = np.arange(length), len(self.freqs)
+        self.fft_size = 1 << (length + m - 2).bit_length() # puissance de 2 >= length + m - 1
+        w = -2j * np.pi * resolution / rate # pas angulaire entre deux fréquences évaluées
+        self.pre = np.exp(-2j * np.pi * min_freq / rate * n + w * n ** 2 / 2) # début de la bande et chirp d'entrée
+        if window:
+            self.pre *= WINDOWS[window](length)
+        k = np.arange(m)
+        self.post = np.exp(w * k ** 2 / 2) # chirp de sortie
+        chirp = np.zeros(self.fft_size, dtype=complex)
+        chirp[:m] = np.exp(-w * k ** 2 / 2)
+        chirp[self.fft_size - length + 1:] = np.exp(-w * n[:0:-1] ** 2 / 2) # indices négatifs -(length - 1) .. -1
+        self.chirp_fft = np.fft.fft(chirp)
+
+    def spectrum(self, data):
+        # module de la transformée sur la bande, pour une fenêtre (1D) ou plusieurs fenêtres d'un coup (2D)
+        product = np.fft.fft(data * self.pre, n=self.fft_size, axis=-1) * self.chirp_fft
+        return np.abs(np.fft.ifft(product, axis=-1)[..., :len(self.freqs)] * self.post)
+
+@functools.lru_cache(maxsize=32)
+def get_plan(length, rate, min_freq, max_freq, window=None):
+    return AnalysisPlan(length, rate, min_freq, max_freq, window)
+
+@functools.lru_cache(maxsize=32)
+def get_zoom_plan(length, rate, min_freq, max_freq, resolution=1, window=None):
+    return ZoomPlan(length, rate, min_freq, max_freq, resolution, window)
+
+def peak_candidates(plan, fft_data, factor=3):
+    # fréquences de tous les bins de la bande qui dépassent factor fois le bruit moyen de la bande
+    # (même résultat que l'ancienne boucle for sur filtered_fft, en une seule opération numpy)
+    band = fft_data[plan.band]
+    if len(band) == 0:
+        return plan.band_freqs
+    return plan.band_freqs[band > factor * band.mean()]
+
+def candidate_stats(plan, spectra, factor=3):
+    # même critère que peak_candidates, pour un spectre par canal (2D, une ligne par canal):
+    # renvoie, pour chaque ligne, la somme et le nombre des fréquences candidates (de quoi faire la moyenne)
+    band = np.asarray(spectra)[..., plan.band]
+    if band.shape[-1] == 0:
+        zeros = np.zeros(band.shape[:-1])
+        return zeros, zeros.astype(int)
+    above = band > factor * band.mean(axis=-1, keepdims=True)
+    return above @ plan.band_freqs, above.sum(axis=-1)
+
+def find_peak(plan, spectra, factor=3):
+    # pic le plus fort de la bande, pour une fenêtre (1D) ou un lot de fenêtres (2D): renvoie (fréquences, amplitudes),
+    # la fréquence vaut nan quand le pic ne dépasse pas factor fois le bruit moyen
+    spectra = np.asarray(spectra)
+    band = spectra[..., plan.band]
+    if band.shape[-1] == 0:
+        nan = np.full(spectra.shape[:-1], np.nan)
+        return nan, nan
+
+    peaks = np.argmax(band, axis=-1)
+    amps = np.take_along_axis(band, peaks[..., None], axis=-1)[..., 0]
+    valid = amps > factor * band.mean(axis=-1)
+
+    # interpolation parabolique sur le log de l'amplitude du pic et de ses deux voisins:
+    # donne la position du sommet entre deux bins (précision bien meilleure que bin_width)
+    # https://ccrma.stanford.edu/~jos/sasp/Quadratic_Interpolation_Spectral_Peaks.html
+    index = peaks + plan.band.start
+    left = np.take_along_axis(spectra, np.maximum(index - 1, 0)[..., None], axis=-1)[..., 0]
+    right = np.take_along_axis(spectra, np.minimum(index + 1, spectra.shape[-1] - 1)[..., None], axis=-1)[..., 0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a, b, c = np.log(left + 1e-12), np.log(amps + 1e-12), np.log(right + 1e-12)
+        denom = a - 2 * b + c
+        delta = np.where(denom < 0, 0.5 * (a - c) / denom, 0.0)
+    delta = np.clip(delta, -0.5, 0.5)
+
+    freqs = np.where(valid, plan.freqs[0] + (index + delta) * plan.bin_width, np.nan)
+    return freqs, amps
+
+# correspondance fréquence -> note, en lot: pour étiqueter tout le suivi d'un fichier (une note par fenêtre)
+# sans appeler math.log2 ni formater une chaîne par valeur. les bornes entre deux demi-tons (à mi-chemin en
+# échelle logarithmique) sont calculées une fois par (La4, langue); np.searchsorted trouve la note de chaque
+# fréquence par dichotomie, pour tout le tableau d'un coup
+# https://en.wikipedia.org/wiki/Piano_key_frequencies
+
+NOTE_NAMES = {
+    'fr': ['Do', 'Do#', 'Re', 'Re#', 'Mi', 'Fa', 'Fa#', 'Sol', 'Sol#', 'La', 'La#', 'Si'],
+    'en': ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B'],
+}
+
+# numéros des touches couvertes (numérotation du piano: La4 = 49, Do0 = -8 ~ 16 Hz, Si10 = 123 ~ 31 kHz)
+MIN_KEY, MAX_KEY = -8, 123
+
+class NoteTable:
+    def __init__(self, a4=440.0, names='fr'):
+        self.a4 = a4
+        self.names = NOTE_NAMES[names]
+        self.keys = np.arange(MIN_KEY, MAX_KEY + 1)
+        self.centers = a4 * 2 ** ((self.keys - 49) / 12) # fréquence juste de chaque touche
+        # bornes[i] = limite basse de la touche i, la dernière borne est la limite haute de la dernière touche
+        self.bounds = a4 * 2 ** ((np.arange(MIN_KEY, MAX_KEY + 2) - 49.5) / 12)
+        # Do = 0 et changement d'octave au Do, comme la notation scientifique (La4, Do5...)
+        self.notes = (self.keys + 8) % 12
+        self.octaves = (self.keys + 8) // 12
+        self.labels = np.array([f"{self.names[note]}{octave}" for note, octave in zip(self.notes, self.octaves)], dtype=object)
+
+    def lookup(self, freqs):
+        # position de chaque fréquence dans la table, -1 hors de la table (ou nan, fréquence nulle...)
+        freqs = np.asarray(freqs, dtype=float)
+        pos = np.searchsorted(self.bounds, freqs, side='right') - 1
+        return np.where((pos >= 0) & (pos < len(self.keys)), pos, -1)
+
+    def map(self, freqs):
+        # (note, octave, écart en cents): note de 0 (Do) à 11 (Si), -1 et nan si la fréquence n'a pas de note
+        freqs = np.asarray(freqs, dtype=float)
+        pos = self.lookup(freqs)
+        valid = pos >= 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cents = np.where(valid, 1200 * np.log2(freqs / self.centers[pos]), np.nan)
+        return np.where(valid, self.notes[pos], -1), np.where(valid, self.octaves[pos], -1), cents
+
+    def label(self, freqs):
+        # noms des notes ('La4', 'A4'...), None pour les fréquences sans note; mêmes dimensions que freqs
+        pos = self.lookup(freqs)
+        return np.where(pos >= 0, self.labels[pos], None)
+
+    # une seule fréquence (labels de l'interface, historique): calcul direct avec math, bien plus rapide que de
+    # passer par des tableaux numpy pour une valeur. même découpage que lookup (le milieu exact va à la note du dessus)
+    def key(self, freq):
+        # numéro de la touche de piano la plus proche (La4 = 49), même hors de la table
+        return math.floor(12 * math.log2(freq / self.a4) + 49.5)
+
+    def describe(self, freq):
+        # (nom de la note, écart en cents), (None, nan) si la fréquence n'a pas de note
+        if not freq > 0: # aussi nan
+            return None, math.nan
+        position = 12 * math.log2(freq / self.a4) + 49
+        key = math.floor(position + 0.5)
+        if not MIN_KEY <= key <= MAX_KEY:
+            return None, math.nan
+        return self.labels[key - MIN_KEY], 100 * (position - key)
+
+@functools.lru_cache(maxsize=8)
+def get_note_table(a4=440.0, names='fr'):
+    return NoteTable(a4, names)
+
+def freq_to_note(freq, a4=440.0, names='fr'):
+    return get_note_table(a4, names).describe(freq)[0]
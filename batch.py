@@ -0,0 +1,131 @@
+import argparse, csv, json, os, sys, numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from wavstream import MappedWav, stft_pitch, stft_plan, stft_params, spectrum_fundamentals
+from analyse import get_note_table
+from cache import SpectralCache, default_cache_dir
+from decimation import Decimator
+
+# analyse en lot, sans interface graphique: python batch.py fichiers_ou_dossiers... [-o resultats.jsonl]
+# chaque fichier est analysé dans un processus séparé (un par cœur), les résultats sont écrits dès qu'ils arrivent
+
+def find_wav_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    if name.lower().endswith('.wav'):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+def analyse_file(path, min_freq=250, max_freq=1100, window=4096, hop=2048, decimate=False, cache_dir=None, a4=440.0, note_names='fr'):
+    # même analyse que le tab Fichier: STFT par blocs, fondamentale par fenêtre et spectre moyen, pour chaque canal
+    try:
+        wav = MappedWav(path)
+        decimator = Decimator(wav.rate, max_freq) if decimate else None
+        params = stft_params(wav.rate, min_freq, max_freq, window, hop, decimator)
+        cache = SpectralCache(cache_dir) if cache_dir else None
+        file_hash, cached = cache.lookup(path, params) if cache else (None, None)
+        if cached:
+            times, pitches, fundamentals = cached['times'], cached['pitches'], cached['fundamentals']
+        else:
+            plan = stft_plan(wav.rate, min_freq, max_freq, window, decimator)
+            times, pitches = [], []
+            spectrum_sum = np.zeros((wav.channels, len(plan.freqs)))
+            spectrum_count = 0
+            for block_times, block_pitches, block_sum, count in stft_pitch(wav, min_freq, max_freq, window=window, hop=hop, decimator=decimator):
+                times.append(block_times)
+                pitches.append(block_pitches)
+                spectrum_sum += block_sum
+                spectrum_count += count
+            times, pitches = np.concatenate(times), np.concatenate(pitches, axis=1) # pitches: (channels, fenêtres)
+            spectrum = spectrum_sum / spectrum_count
+            fundamentals = spectrum_fundamentals(plan, spectrum)
+            if cache:
+                try:
+                    cache.store(path, file_hash, params, {'times': times, 'pitches': pitches, 'freqs': plan.freqs,
+                                                          'spectrum': spectrum, 'fundamentals': fundamentals})
+                except OSError:
+                    pass # le cache n'est qu'une optimisation: le résultat est quand même écrit
+        return {
+            'file': path,
+            'duration': wav.duration,
+            'rate': wav.rate,
+            'channels': wav.channels,
+            'fundamentals': fundamentals, # une valeur par canal
+            'notes': get_note_table(a4, note_names).label(np.array(fundamentals, dtype=float)).tolist(), # None -> nan -> pas de note
+            'times': np.asarray(times),
+            'pitches': np.asarray(pitches),
+        }
+    except Exception as e:
+        # un fichier illisible (en-tête tronqué: struct.error, format inconnu...) donne une ligne d'erreur
+        # au lieu d'arrêter tout le lot
+        return {'file': path, 'error': f"{type(e).__name__}: {e}"}
+
+def write_jsonl(result, out):
+    if 'error' not in result:
+        # le suivi de la fondamentale est écrit sous forme de listes [temps, fréquence du canal 1, du canal 2...]
+        # (null si rien détecté)
+        track = [[round(float(t), 4)] + [None if np.isnan(f) else round(float(f), 2) for f in pitches]
+                 for t, pitches in zip(result.pop('times'), result.pop('pitches').T)]
+        result['track'] = track
+    out.write(json.dumps(result) + "\n")
+
+def write_csv(result, writer, note_table):
+    # une ligne par fenêtre analysée et par canal, avec la note de chaque fenêtre et son écart en cents
+    # (calculés pour tout le suivi d'un canal en une fois)
+    if 'error' in result:
+        writer.writerow([result['file'], '', '', '', '', '', '', '', result['error']])
+        return
+    for channel, (fundamental, note, pitches) in enumerate(zip(result['fundamentals'], result['notes'], result['pitches'])):
+        fundamental = '' if fundamental is None else f"{fundamental:.2f}"
+        pitch_notes = note_table.label(pitches)
+        _, _, cents = note_table.map(pitches)
+        for t, f, pitch_note, cent in zip(result['times'], pitches, pitch_notes, cents):
+            writer.writerow([result['file'], channel + 1, fundamental, note or '', f"{t:.4f}", '' if np.isnan(f) else f"{f:.2f}",
+                             pitch_note or '', '' if np.isnan(cent) else f"{cent:+.1f}", ''])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyse en lot de fichiers WAV (fréquence fondamentale et note).")
+    parser.add_argument('paths', nargs='+', help="fichiers WAV ou dossiers (parcourus récursivement)")
+    parser.add_argument('-o', '--output', help="fichier de sortie (par défaut: sortie standard)")
+    parser.add_argument('-f', '--format', choices=['jsonl', 'csv'], help="format de sortie (déduit de l'extension sinon jsonl)")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(), help="nombre de processus (par défaut: nombre de cœurs)")
+    parser.add_argument('--min-freq', type=int, default=250)
+    parser.add_argument('--max-freq', type=int, default=1100)
+    parser.add_argument('--window', type=int, default=4096, help="taille de la fenêtre de la FFT courte")
+    parser.add_argument('--hop', type=int, default=2048, help="décalage entre deux fenêtres")
+    parser.add_argument('--a4', type=float, default=440.0, help="fréquence de référence du La4 en Hz (par défaut: 440)")
+    parser.add_argument('--notes', choices=['fr', 'en'], default='fr', help="noms des notes: fr (Do Ré Mi) ou en (C D E)")
+    parser.add_argument('--decimate', action='store_true', help="décimer le signal avant la FFT (plus rapide)")
+    parser.add_argument('--cache', nargs='?', const='', metavar='DOSSIER',
+                        help="réutiliser les analyses déjà faites (cache sur disque, dossier par défaut: ~/.cache/analyse-audio)")
+    args = parser.parse_args(argv)
+
+    format = args.format or ('csv' if args.output and args.output.endswith('.csv') else 'jsonl')
+    files = list(find_wav_files(args.paths))
+    out = open(args.output, 'w', newline='') if args.output else sys.stdout
+    writer = csv.writer(out) if format == 'csv' else None
+    if writer:
+        writer.writerow(['file', 'channel', 'fundamental', 'note', 'time', 'pitch', 'pitch_note', 'cents', 'error'])
+
+    # https://docs.python.org/3/library/concurrent.futures.html#processpoolexecutor
+    # seul le chemin est envoyé aux processus: chaque processus ouvre et projette son fichier lui-même
+    cache_dir = None if args.cache is None else (args.cache or default_cache_dir())
+    settings = [(args.min_freq, args.max_freq, args.window, args.hop, args.decimate, cache_dir, args.a4, args.notes)] * len(files)
+    note_table = get_note_table(args.a4, args.notes)
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            chunksize = max(1, len(files) // (4 * args.workers))
+            for result in executor.map(analyse_file, files, *zip(*settings), chunksize=chunksize):
+                if writer:
+                    write_csv(result, writer, note_table)
+                else:
+                    write_jsonl(result, out)
+                out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+import argparse, datetime, gc, json, os, platform, struct, subprocess, sys, tempfile, time, tracemalloc, numpy as np
+from decode import decode_channel, decode_planar
+from decimation import Decimator
+from analyse import get_plan, get_zoom_plan, find_peak, peak_candidates, freq_to_note, get_note_table
+from pitch import ESTIMATORS, get_estimator
+from wavstream import MappedWav, stft_pitch
+from capture import CaptureEngine
+from sources import SourceBackend, SyntheticInput
+from recorder import wav_header
+from render import minmax_decimate
+
+# mesures de performance, à lancer avec: python bench.py [--seconds durée] [--only decode decimation zoom pitch channels import suite]
+#
+# suite: mesures reproductibles (signaux synthétiques à graine fixe et samples/*.wav) de chaque étape du chemin
+# critique, enregistrées en JSON pour comparer deux commits:
+#   python bench.py --only suite --save avant.json
+#   python bench.py --only suite --compare avant.json [--threshold 0.1] [--noise-floor 0.005]   (code de sortie 1 si régression)
+
+RATE = 44100
+IMPORT_BUDGET = 0.5 # temps maximal (s) pour importer l'analyse sans interface, interpréteur compris
+HEADLESS_MODULES = ['decode', 'analyse', 'wavstream', 'capture', 'batch', 'pitch', 'stft', 'decimation', 'history', 'sources',
+                    'cache', 'playback', 'recorder', 'instrumentation', 'render', 'server']
+SIZES = {'chunk': 1024 / RATE, '10s': 10, '60s': 60, '1h': 3600} # durées (s) des fichiers analysés par la suite
+GUI_MODULES = ['PySide6', 'pyqtgraph', 'pyaudio']
+
+def legacy_decode(frames, sampwidth, channels):
+    # ancien décodage de process_file (struct.unpack puis np.array), gardé pour comparer
+    num_samples = len(frames) // sampwidth
+    format = {1: "b", 2: "h", 4: "i"}[sampwidth] # "b" signé: avec "B", np.array(..., int8) débordait
+    unpacked_data = struct.unpack(f"{num_samples}{format}", frames)
+    data = np.array(unpacked_data, dtype={1: np.int8, 2: np.int16, 4: np.int32}[sampwidth])
+    return data[::channels]
+
+def new_decode(frames, sampwidth, channels):
+    # decode_channel renvoie une vue: on force la copie contiguë pour comparer à travail égal
+    return np.ascontiguousarray(decode_channel(frames, sampwidth, channels))
+
+def best_time(func, *args, repeat=5):
+    # on garde le meilleur temps: c'est le moins perturbé par le reste du système
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def random_frames(num_frames, sampwidth, channels):
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 256, num_frames * sampwidth * channels, dtype=np.uint8).tobytes()
+
+def bench_decode(seconds):
+    print(f"Décodage PCM ({seconds} s de son à {RATE} Hz)")
+    for sampwidth in (1, 2, 3, 4):
+        for channels in (1, 2):
+            frames = random_frames(int(seconds * RATE), sampwidth, channels)
+            num_samples = int(seconds * RATE) * channels
+
+            new = best_time(new_decode, frames, sampwidth, channels)
+            line = f"  {8 * sampwidth:2d} bits, {channels} canal(aux): frombuffer {num_samples / new / 1e6:8.1f} M échantillons/s"
+            if sampwidth != 3: # l'ancien code ne savait pas décoder le 24 bits
+                old = best_time(legacy_decode, frames, sampwidth, channels, repeat=1)
+                line += f" | struct {num_samples / old / 1e6:6.1f} M échantillons/s (x{old / new:.0f})"
+            print(line)
+
+def bench_decimation(resolution=5, max_freq=1100):
+    # FFT directe à 44,1 kHz contre décimation + FFT, pour la même résolution en fréquence (même durée de signal)
+    num_samples = int(RATE / resolution)
+    decimator = Decimator(RATE, max_freq)
+    data = np.random.default_rng(0).normal(size=num_samples + decimator.history)
+
+    direct = best_time(lambda: np.abs(np.fft.rfft(data[decimator.history:])), repeat=20)
+    decimated = best_time(lambda: np.abs(np.fft.rfft(decimator.decimate(data))), repeat=20)
+    print(f"Décimation (résolution {resolution} Hz, max_freq {max_freq} Hz, facteur {decimator.factor})")
+    print(f"  FFT directe de {num_samples} échantillons: {direct * 1e6:8.0f} µs")
+    print(f"  décimation + FFT de {num_samples // decimator.factor} échantillons: {decimated * 1e6:8.0f} µs (x{direct / decimated:.1f})")
+
+def bench_zoom(length=1024, min_freq=250, max_freq=1100, resolution=1, trials=200):
+    # zoom FFT (chirp-z) contre rfft: temps de calcul et erreur sur la fréquence d'une sinusoïde bruitée
+    rfft_plan = get_plan(length, RATE, min_freq, max_freq)
+    padded_plan = get_plan(int(RATE / resolution), RATE, min_freq, max_freq) # rfft avec zéros ajoutés, même pas que la zoom FFT
+    zoom_plan = get_zoom_plan(length, RATE, min_freq, max_freq, resolution)
+    rng = np.random.default_rng(0)
+    t = np.arange(length) / RATE
+    signals = [(f, np.sin(2 * np.pi * f * t + rng.uniform(0, 2 * np.pi)) + 0.1 * rng.normal(size=length))
+               for f in rng.uniform(min_freq + 10, max_freq - 10, trials)]
+
+    print(f"Zoom FFT ({length} échantillons, bande {min_freq}-{max_freq} Hz, pas {resolution} Hz)")
+    for name, plan, pad in (("rfft", rfft_plan, None), ("rfft + zéros", padded_plan, padded_plan.length), ("chirp-z", zoom_plan, None)):
+        spectrum = (lambda x: np.abs(np.fft.rfft(x, n=pad))) if pad else plan.spectrum
+        duration = best_time(lambda: spectrum(signals[0][1]), repeat=50)
+        errors = [abs(find_peak(plan, spectrum(x))[0] - f) for f, x in signals]
+        print(f"  {name:13s}: {duration * 1e6:7.0f} µs/fenêtre, erreur moyenne {np.nanmean(errors):6.2f} Hz")
+
+def bench_pitch(chunk=1024, min_freq=250, max_freq=1100):
+    # latence et précision de la fondamentale en direct: on rejoue les fichiers d'exemple bloc par bloc,
+    # comme le timer de l'interface, et on compte les ticks avant la première valeur affichée
+    print(f"Détection de la fondamentale (blocs de {chunk} échantillons, {1000 * chunk / RATE:.0f} ms par tick)")
+    for path, expected in (("samples/400hz.wav", 400), ("samples/700hz.wav", 700)):
+        wav = MappedWav(path)
+        blocks = wav.read(0, wav.num_frames // chunk * chunk)[:, 0].astype(np.float64).reshape(-1, chunk)
+        print(f"  {path} ({expected} Hz)")
+
+        # méthode d'origine: pics au-dessus de 3 fois le bruit, moyennés dès que plus de 3 ont été collectés
+        plan = get_plan(chunk, wav.rate, min_freq, max_freq)
+        collected, first, values = [], None, []
+        for tick, block in enumerate(blocks):
+            collected.extend(peak_candidates(plan, plan.spectrum(block)))
+            if len(collected) > 3:
+                first = tick + 1 if first is None else first
+                values.append(np.mean(collected))
+                collected = []
+        duration = best_time(lambda: peak_candidates(plan, plan.spectrum(blocks[0])), repeat=50)
+        print(f"    {'moyenne FFT':12s}: 1re valeur après {first} tick(s), erreur moyenne {np.mean(np.abs(np.array(values) - expected)):6.2f} Hz, {duration * 1e6:5.0f} µs/tick")
+
+        for name in ESTIMATORS:
+            estimator = get_estimator(name, min_freq, max_freq)
+            freqs = np.array([estimator.estimate(block, wav.rate)[0] for block in blocks])
+            detected = np.flatnonzero(~np.isnan(freqs))
+            first = detected[0] + 1 if len(detected) else None
+            duration = best_time(lambda: estimator.estimate(blocks[0], wav.rate), repeat=50)
+            print(f"    {name:12s}: 1re valeur après {first} tick(s), erreur moyenne {np.nanmean(np.abs(freqs - expected)):6.2f} Hz, {duration * 1e6:5.0f} µs/tick")
+
+def bench_channels(length=1024, min_freq=250, max_freq=1100):
+    # analyse multicanal d'un bloc: décodage en (channels, samples) puis une seule FFT en lot, contre une boucle
+    # sur les canaux (décodage d'un canal, FFT, pic); le temps en lot doit croître moins vite que le nombre de canaux
+    plan = get_plan(length, RATE, min_freq, max_freq)
+    print(f"Analyse multicanal ({length} échantillons par canal)")
+    for channels in (1, 2, 4, 8):
+        frames = random_frames(length, 2, channels)
+        batched = best_time(lambda: find_peak(plan, plan.spectrum(decode_planar(frames, 2, channels))), repeat=50)
+        looped = best_time(lambda: [find_peak(plan, plan.spectrum(decode_channel(frames, 2, channels, c))) for c in range(channels)], repeat=50)
+        print(f"  {channels} canal(aux): en lot {batched * 1e6:6.0f} µs, boucle {looped * 1e6:6.0f} µs (x{looped / batched:.1f})")
+
+def bench_import(repeat=5):
+    # import à froid dans un nouvel interpréteur: on vérifie que l'analyse sans interface ne charge ni Qt
+    # ni PortAudio, et qu'elle reste sous IMPORT_BUDGET
+    code = (f"import sys; import {', '.join(HEADLESS_MODULES)}; "
+            f"print(','.join(m for m in {GUI_MODULES} if m in sys.modules))")
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        loaded = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout.strip()
+        times.append(time.perf_counter() - start)
+
+    best = min(times)
+    print(f"Import à froid de {', '.join(HEADLESS_MODULES)}: {best * 1000:.0f} ms (budget {IMPORT_BUDGET * 1000:.0f} ms)")
+    if loaded:
+        print(f"  ERREUR: modules de l'interface importés: {loaded}")
+    if best > IMPORT_BUDGET:
+        print("  ERREUR: budget dépassé")
+    return not loaded and best <= IMPORT_BUDGET
+
+def measure(func, ticks, samples_per_tick, warmup=3, min_sample_time=0.002, repeat=5):
+    # latence de chaque appel (p50, p99), débit en échantillons/s, puis pic mémoire dans une passe séparée
+    # (tracemalloc ralentit les allocations: il fausserait les temps).
+    # les étapes rapides ne durent que quelques µs, du même ordre que le bruit de perf_counter: chaque mesure
+    # chronomètre un lot d'appels (assez pour durer min_sample_time) et en garde la durée moyenne, comme timeit.
+    # les mesures sont faites en repeat séries: p50 est la plus petite des médianes des séries (une série
+    # ralentie par le reste du système ne compte pas), p99 porte sur toutes les mesures
+    for _ in range(warmup):
+        func()
+    start = time.perf_counter()
+    func()
+    number = max(1, int(min_sample_time / max(time.perf_counter() - start, 1e-9)))
+    latencies = np.empty((repeat, max(1, ticks // repeat)))
+    gc.disable() # comme timeit: un passage du ramasse-miettes tomberait au hasard dans une mesure
+    try:
+        for i in np.ndindex(latencies.shape):
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            latencies[i] = (time.perf_counter() - start) / number
+    finally:
+        gc.enable()
+    p50 = np.median(latencies, axis=1).min()
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'samples_per_tick': samples_per_tick,
+        'throughput': samples_per_tick / p50, # échantillons/s
+        'p50_ms': float(p50 * 1000),
+        'p99_ms': float(np.percentile(latencies, 99) * 1000),
+        'peak_memory_kb': peak / 1024,
+    }
+
+def write_test_wav(path, seconds, freq=440):
+    # fichier de test écrit par blocs (un fichier d'une heure ne passe jamais entièrement en mémoire)
+    source = SyntheticInput('tone', freq, duration=seconds, noise=0.05)
+    with open(path, 'wb') as f:
+        f.write(wav_header(RATE, 1, 2, int(seconds * RATE) * 2))
+        while True:
+            samples = source.read(RATE * 10)
+            if len(samples) == 0:
+                break
+            f.write(samples.tobytes())
+
+def bench_file(path, window=4096, hop=2048, repeat=3, min_blocks=50):
+    # analyse complète d'un fichier (comme le tab Fichier et batch.py): latence par bloc de 64 fenêtres,
+    # débit sur la meilleure des analyses, pic mémoire sur une analyse séparée. un fichier court ne donne qu'un
+    # ou deux blocs par analyse: on la refait jusqu'à avoir au moins min_blocks latences (et repeat analyses).
+    # p50: plus petite des médianes de repeat séries de latences consécutives, comme dans measure
+    wav = MappedWav(path)
+    latencies, best, runs = [], np.inf, 0
+    while runs < repeat or len(latencies) < min_blocks:
+        runs += 1
+        start = time.perf_counter()
+        blocks = stft_pitch(wav, 250, 1100, window=window, hop=hop)
+        while True:
+            block_start = time.perf_counter()
+            if next(blocks, None) is None:
+                break
+            latencies.append(time.perf_counter() - block_start)
+        best = min(best, time.perf_counter() - start)
+    p50 = min(np.median(series) for series in np.array_split(latencies, repeat))
+    tracemalloc.start()
+    for _ in stft_pitch(wav, 250, 1100, window=window, hop=hop):
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'samples_per_tick': 64 * hop,
+        'throughput': wav.num_frames / best,
+        'p50_ms': float(p50 * 1000),
+        'p99_ms': float(np.percentile(latencies, 99) * 1000),
+        'peak_memory_kb': peak / 1024,
+    }
+
+def bench_suite(sizes, ticks=500, chunk=1024):
+    rng = np.random.default_rng(0)
+    t = np.arange(chunk) / RATE
+    block = (3000 * np.sin(2 * np.pi * 440 * t) + 300 * rng.normal(size=chunk)).astype(np.int16)
+    frames = block.tobytes()
+    plan = get_plan(chunk, RATE, 250, 1100)
+    spectrum = plan.spectrum(block.astype(np.float64))
+    results = {}
+
+    # étapes d'un tick en direct, séparément puis enchaînées (capture -> tampon -> FFT -> pics)
+    results['decode'] = measure(lambda: np.ascontiguousarray(decode_planar(frames, 2, 1)), ticks, chunk)
+    results['fft'] = measure(lambda: plan.spectrum(block), ticks, chunk)
+    results['peaks'] = measure(lambda: peak_candidates(plan, spectrum), ticks, chunk)
+    results['peak_interpolated'] = measure(lambda: find_peak(plan, spectrum), ticks, chunk)
+    freqs = rng.uniform(250, 1100, 1000)
+    results['note'] = measure(lambda: [freq_to_note(f) for f in freqs], ticks // 10, len(freqs))
+    note_table = get_note_table()
+    results['note_batch'] = measure(lambda: (note_table.label(freqs), note_table.map(freqs)), ticks // 10, len(freqs))
+    history = np.cumsum(rng.uniform(0.02, 0.04, 100000)), rng.uniform(250, 1100, 100000)
+    results['render'] = measure(lambda: minmax_decimate(history[0], history[1], 1000), ticks // 10, len(history[0]))
+
+    source = SyntheticInput('tone', 440, noise=0.05)
+    capture = CaptureEngine(SourceBackend(source, realtime=False, threaded=False), rate=RATE, chunk=chunk)
+    capture.subscribe(lambda data: peak_candidates(plan, plan.spectrum(data[0])))
+    capture.start()
+    results['live_tick'] = measure(lambda: (capture.stream.step(), capture.dispatch(chunk)), ticks, chunk)
+
+    # analyse de fichiers: les exemples fournis puis des fichiers synthétiques de différentes tailles
+    for path in ("samples/400hz.wav", "samples/700hz.wav"):
+        results[f"file_{os.path.basename(path)}"] = bench_file(path)
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            path = os.path.join(directory, f"{size}.wav")
+            write_test_wav(path, SIZES[size])
+            results[f"file_{size}"] = bench_file(path)
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_results(results, baseline=None, threshold=0.1, noise_floor=0.005):
+    # une ligne par étape; avec une référence, écart de p50 et de débit. régression: p50 plus lent de plus de
+    # threshold et de plus de noise_floor ms (quelques µs d'écart sur une étape très courte ne sont que du bruit)
+    regressions = []
+    print(f"{'étape':24s} {'débit (éch./s)':>16s} {'p50 (ms)':>10s} {'p99 (ms)':>10s} {'mémoire (ko)':>13s}")
+    for name, result in results.items():
+        line = f"{name:24s} {result['throughput']:16.3g} {result['p50_ms']:10.3f} {result['p99_ms']:10.3f} {result['peak_memory_kb']:13.0f}"
+        reference = (baseline or {}).get(name)
+        if reference:
+            slower = result['p50_ms'] / reference['p50_ms'] - 1
+            lower = 1 - result['throughput'] / reference['throughput']
+            line += f"   p50 {slower:+6.1%}, débit {-lower:+6.1%}"
+            if slower > threshold and result['p50_ms'] - reference['p50_ms'] > noise_floor:
+                line += "  RÉGRESSION"
+                regressions.append(name)
+        print(line)
+    return regressions
+
+def run_suite(sizes, save=None, compare=None, threshold=0.1, noise_floor=0.005):
+    results = bench_suite(sizes)
+    baseline = None
+    if compare:
+        with open(compare) as f:
+            reference = json.load(f)
+        baseline = reference['results']
+        print(f"Suite de mesures (référence: {compare}, commit {reference['meta'].get('commit')}, seuil {threshold:.0%})")
+    else:
+        print("Suite de mesures")
+    regressions = print_results(results, baseline, threshold, noise_floor)
+    if save:
+        meta = {'commit': git_commit(), 'date': datetime.datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine(), 'sizes': sizes}
+        with open(save, 'w') as f:
+            json.dump({'meta': meta, 'results': results}, f, indent=2)
+    if regressions:
+        print(f"  ERREUR: régression sur {', '.join(regressions)}")
+    return not regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=10, help="durée du son utilisé pour les mesures")
+    parser.add_argument('--only', nargs='+', choices=['decode', 'decimation', 'zoom', 'pitch', 'channels', 'import', 'suite'], help="ne lancer que certaines mesures")
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=['chunk', '10s', '60s'], help="tailles des fichiers de la suite (1h: ~300 Mo sur le disque)")
+    parser.add_argument('--save', help="enregistrer les résultats de la suite (JSON)")
+    parser.add_argument('--compare', help="comparer la suite à des résultats enregistrés avec --save")
+    parser.add_argument('--threshold', type=float, default=0.1, help="écart relatif au-delà duquel une étape est en régression")
+    parser.add_argument('--noise-floor', type=float, default=0.005, help="écart minimal de p50 (ms) pour parler de régression")
+    args = parser.parse_args()
+
+    ok = True
+    if not args.only or 'decode' in args.only:
+        bench_decode(args.seconds)
+    if not args.only or 'decimation' in args.only:
+        bench_decimation()
+    if not args.only or 'zoom' in args.only:
+        bench_zoom()
+    if not args.only or 'pitch' in args.only:
+        bench_pitch()
+    if not args.only or 'channels' in args.only:
+        bench_channels()
+    if not args.only or 'import' in args.only:
+        ok = bench_import() and ok
+    if not args.only or 'suite' in args.only:
+        ok = run_suite(args.sizes, args.save, args.compare, args.threshold, args.noise_floor) and ok
+    sys.exit(0 if ok else 1)
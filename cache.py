@@ -0,0 +1,213 @@
+import hashlib, json, os, shutil, tempfile, numpy as np
+
+# cache sur disque des analyses de fichiers: le résultat ne dépend que du contenu du fichier et des paramètres
+# d'analyse, donc rouvrir un fichier déjà analysé ne demande que de relire quelques .npy (projetés en mémoire).
+#
+# <dossier>/entries/<clé>/   un dossier par analyse: times.npy, pitches.npy, freqs.npy, spectrum.npy, meta.json
+# <dossier>/paths/<id>       hash du contenu d'un fichier, retrouvé à partir de (chemin, taille, date de modification)
+#                            pour ne pas relire tout le fichier à chaque ouverture. un fichier renommé, copié ou
+#                            touché n'y est plus: on relit alors son contenu pour calculer le hash (bien moins
+#                            coûteux que de refaire l'analyse) et on retrouve quand même son entrée. l'interface
+#                            calcule ce hash petit à petit pendant l'analyse (lookup_known puis lookup_hash)
+#
+# la taille totale est plafonnée: on supprime les entrées utilisées le moins récemment (LRU, date du dossier).
+# l'index paths/ est nettoyé en même temps: ses fichiers dont le hash n'a plus d'entrée sont supprimés, et il
+# ne garde au plus que max_paths fichiers (les moins récemment utilisés partent en premier)
+
+ARRAYS = ('times', 'pitches', 'freqs', 'spectrum')
+
+def default_cache_dir():
+    # https://specifications.freedesktop.org/basedir-spec/latest/
+    return os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'analyse-audio')
+
+class FileHasher:
+    # hash du contenu calculé morceau par morceau (le fichier n'est jamais chargé en entier):
+    # d'un coup avec finish, ou petit à petit (update(taille) à chaque bloc d'analyse) pour ne pas bloquer l'interface
+    def __init__(self, path, block_size=1 << 20):
+        self.file = open(path, 'rb')
+        self.hash = hashlib.blake2b(digest_size=20)
+        self.block_size = block_size
+
+    def update(self, size=None):
+        data = self.file.read(size or self.block_size)
+        self.hash.update(data)
+        return len(data) > 0
+
+    def finish(self):
+        try:
+            while self.update():
+                pass
+        finally:
+            self.close()
+        return self.hash.hexdigest()
+
+    def close(self):
+        self.file.close()
+
+def content_hash(path):
+    return FileHasher(path).finish()
+
+class SpectralCache:
+    def __init__(self, directory=None, max_bytes=512 * 2**20, max_paths=10000):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.max_paths = max_paths
+        os.makedirs(os.path.join(self.directory, 'entries'), exist_ok=True)
+        os.makedirs(os.path.join(self.directory, 'paths'), exist_ok=True)
+
+    def path_id(self, path):
+        # identifiant de la version du fichier sur le disque: change si le fichier est modifié
+        stat = os.stat(path)
+        key = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+        return hashlib.blake2b(key.encode(), digest_size=20).hexdigest()
+
+    def entry_key(self, file_hash, params):
+        text = file_hash + json.dumps(params, sort_keys=True)
+        return hashlib.blake2b(text.encode(), digest_size=20).hexdigest()
+
+    def known_hash(self, path):
+        path_file = os.path.join(self.directory, 'paths', self.path_id(path))
+        try:
+            with open(path_file) as f:
+                file_hash = f.read().strip()
+            os.utime(path_file) # date d'accès pour le nettoyage de l'index
+            return file_hash
+        except OSError:
+            return None
+
+    def file_hash(self, path):
+        # hash du contenu: retrouvé par (chemin, taille, date) ou calculé puis mémorisé pour la prochaine fois
+        file_hash = self.known_hash(path)
+        if file_hash is None:
+            file_hash = content_hash(path)
+            try:
+                self.remember(path, file_hash)
+            except OSError:
+                pass # seulement un raccourci: le hash sera recalculé la prochaine fois
+        return file_hash
+
+    def remember(self, path, file_hash):
+        path_file = os.path.join(self.directory, 'paths', self.path_id(path))
+        with open(path_file + '.tmp', 'w') as f:
+            f.write(file_hash)
+        os.replace(path_file + '.tmp', path_file)
+
+    def lookup(self, path, params):
+        # (hash du contenu, entrée du cache pour ce fichier ou None s'il n'a jamais été analysé avec ces paramètres)
+        # le hash est à repasser à store: il correspond au contenu lu maintenant, même si le fichier change pendant l'analyse
+        file_hash = self.file_hash(path)
+        return file_hash, self.load(self.entry_key(file_hash, params))
+
+    def lookup_known(self, path, params):
+        # comme lookup, mais sans jamais relire le fichier: (None, None) si (chemin, taille, date) n'est pas dans
+        # l'index. l'appelant calcule alors le hash lui-même (FileHasher) et le passe à lookup_hash
+        file_hash = self.known_hash(path)
+        return (file_hash, self.load(self.entry_key(file_hash, params))) if file_hash else (None, None)
+
+    def lookup_hash(self, path, file_hash, params):
+        # entrée du cache pour un hash calculé par l'appelant (None si absente); le chemin est ajouté à l'index
+        try:
+            self.remember(path, file_hash)
+        except OSError:
+            pass # seulement un raccourci: le hash sera recalculé la prochaine fois
+        return self.load(self.entry_key(file_hash, params))
+
+    def load(self, key):
+        entry = os.path.join(self.directory, 'entries', key)
+        try:
+            with open(os.path.join(entry, 'meta.json')) as f:
+                result = json.load(f)
+            for name in ARRAYS:
+                # https://numpy.org/doc/stable/reference/generated/numpy.load.html (mmap_mode)
+                result[name] = np.load(os.path.join(entry, f"{name}.npy"), mmap_mode='r')
+            os.utime(entry) # date d'accès pour l'éviction LRU
+            return result
+        except (OSError, ValueError):
+            return None
+
+    def store(self, path, file_hash, params, result):
+        # result: tableaux de ARRAYS + valeurs simples (fondamentale, note...) enregistrées dans meta.json
+        key = self.entry_key(file_hash, params)
+        entries = os.path.join(self.directory, 'entries')
+        # écriture dans un dossier temporaire puis renommage: une entrée n'est jamais visible à moitié écrite
+        tmp = tempfile.mkdtemp(dir=entries, prefix='.tmp-')
+        try:
+            for name in ARRAYS:
+                np.save(os.path.join(tmp, f"{name}.npy"), np.asarray(result[name]))
+            meta = {name: value for name, value in result.items() if name not in ARRAYS}
+            meta['params'] = params
+            meta['file_hash'] = file_hash # pour savoir quels fichiers de l'index pointent encore vers une entrée
+            with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+                json.dump(meta, f)
+            target = os.path.join(entries, key)
+            try:
+                os.replace(tmp, target)
+            except OSError:
+                # entrée déjà là: un autre processus (batch.py -j) vient d'enregistrer la même analyse
+                # (même contenu, mêmes paramètres), on garde la sienne
+                if not os.path.isdir(target):
+                    raise
+                shutil.rmtree(tmp, ignore_errors=True)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+        self.remember(path, file_hash)
+        self.evict()
+        return key
+
+    def evict(self):
+        # supprime les entrées les moins récemment utilisées jusqu'à repasser sous max_bytes
+        entries = os.path.join(self.directory, 'entries')
+        sizes = []
+        for name in os.listdir(entries):
+            entry = os.path.join(entries, name)
+            if name.startswith('.tmp-'):
+                continue
+            try:
+                size = sum(entry_file.stat().st_size for entry_file in os.scandir(entry))
+                sizes.append((os.stat(entry).st_mtime, size, entry))
+            except OSError:
+                continue
+        total = sum(size for _, size, _ in sizes)
+        removed = 0
+        for _, size, entry in sorted(sizes):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            removed += 1
+
+        # l'index n'est relu que s'il peut y avoir quelque chose à y supprimer
+        paths = os.path.join(self.directory, 'paths')
+        names = os.listdir(paths)
+        if removed or len(names) > self.max_paths:
+            self.evict_paths(paths, names)
+
+    def evict_paths(self, paths, names):
+        hashes = set()
+        for name in os.listdir(os.path.join(self.directory, 'entries')):
+            try:
+                with open(os.path.join(self.directory, 'entries', name, 'meta.json')) as f:
+                    hashes.add(json.load(f).get('file_hash'))
+            except (OSError, ValueError):
+                continue
+        kept = []
+        for name in names:
+            path_file = os.path.join(paths, name)
+            if name.endswith('.tmp'):
+                continue
+            try:
+                with open(path_file) as f:
+                    file_hash = f.read().strip()
+                if file_hash in hashes:
+                    kept.append((os.stat(path_file).st_mtime, path_file))
+                else:
+                    os.unlink(path_file) # plus aucune entrée pour ce contenu
+            except OSError:
+                continue
+        for _, path_file in sorted(kept)[:max(0, len(kept) - self.max_paths)]:
+            try:
+                os.unlink(path_file)
+            except OSError:
+                pass
@@ -0,0 +1,167 @@
+import time, numpy as np
+from decode import decode_planar
+from instrumentation import Instrumentation
+
+# constantes de PortAudio (portaudio.h, mêmes valeurs que pyaudio.paInt16...): la capture n'a pas besoin
+# d'importer PyAudio, elle peut aussi lire une source de sources.py (fichier, signal synthétique)
+PA_INT16 = 0x8
+PA_INPUT_OVERFLOW = 0x2
+PA_CONTINUE = 0
+
+class RingBuffer:
+    # tampon circulaire préalloué: le thread de capture y écrit, le timer de l'interface y lit
+    # il n'y a qu'un seul écrivain et qu'un seul lecteur, donc pas besoin de verrou:
+    # on copie d'abord les échantillons, puis on publie la nouvelle position d'écriture
+    # avec channels, le tampon a la forme (channels, capacity): une ligne par canal, le temps sur le dernier axe
+    def __init__(self, capacity, dtype=np.int16, channels=None):
+        self.capacity = capacity
+        self.buffer = np.zeros((capacity,) if channels is None else (channels, capacity), dtype=dtype)
+        self.write_pos = 0 # nombre total d'échantillons écrits depuis le début (ne revient jamais à 0)
+
+    def write(self, samples):
+        n = samples.shape[-1]
+        if n > self.capacity: # si le bloc est plus grand que le tampon, seuls les derniers échantillons comptent
+            samples = samples[..., -self.capacity:]
+
+        kept = samples.shape[-1]
+        start = (self.write_pos + n - kept) % self.capacity
+        first = min(kept, self.capacity - start) # partie qui tient avant la fin du tampon
+        self.buffer[..., start:start + first] = samples[..., :first]
+        self.buffer[..., :kept - first] = samples[..., first:] # le reste repart au début du tampon
+        self.write_pos += n
+
+    def read(self, end_pos, n):
+        # copie les n échantillons qui se terminent à la position end_pos
+        start = (end_pos - n) % self.capacity
+        first = min(n, self.capacity - start)
+        out = np.empty(self.buffer.shape[:-1] + (n,), dtype=self.buffer.dtype)
+        out[..., :first] = self.buffer[..., start:start + first]
+        out[..., first:] = self.buffer[..., :n - first]
+        return out
+
+    def latest(self, n):
+        # renvoie les n derniers échantillons écrits (moins s'il n'y en a pas encore assez)
+        pos = self.write_pos
+        n = min(n, pos, self.capacity)
+        return self.read(pos, n), pos
+
+class CaptureEngine:
+    # https://people.csail.mit.edu/hubert/pyaudio/docs/#example-callback-mode-audio-i-o
+    # en mode callback, PortAudio appelle self.callback depuis son propre thread dès qu'un bloc est prêt:
+    # la capture ne dépend plus du timer de l'interface, donc un affichage lent ne fait plus perdre d'échantillons
+    # audio: pyaudio.PyAudio() pour le micro, ou sources.SourceBackend pour une source sans carte son
+    # instrumentation: durées du callback, de la lecture du tampon et de chaque consommateur (désactivée par défaut)
+    def __init__(self, audio, rate=44100, channels=1, chunk=1024, buffer_chunks=32, instrumentation=None):
+        self.audio = audio
+        self.rate = rate
+        self.chunk = chunk
+        self.buffer_chunks = buffer_chunks
+
+        self.overflows = 0 # blocs perdus par PortAudio (le tampon d'entrée a débordé)
+        self.underruns = 0 # lectures du timer sans aucun nouvel échantillon depuis la précédente
+        self.lost_frames = 0 # échantillons écrasés avant d'avoir été lus par un consommateur en flux
+        self.last_callback = None # instant (time.monotonic) du dernier bloc reçu
+        self.instrumentation = instrumentation or Instrumentation(enabled=False)
+        self.callback_stage = self.instrumentation.stage('callback (décodage)')
+
+        # consommateurs de la fenêtre lue à chaque tick (courbe, analyse FFT, enregistreur...)
+        self.subscribers = []
+        self.stream = None
+        self.open(channels)
+
+    def open(self, channels):
+        # tous les canaux sont gardés, entrelacés par PortAudio puis rangés par ligne dans le tampon:
+        # les consommateurs reçoivent des tableaux (channels, samples)
+        self.channels = channels
+        self.ring = RingBuffer(self.chunk * self.buffer_chunks, channels=channels) # ~0.75 s de son avec les valeurs par défaut
+        self.read_pos = 0
+        self.stream_pos = 0
+        self.stream = self.audio.open(
+            format = PA_INT16,
+            channels = channels,
+            rate = self.rate,
+            frames_per_buffer = self.chunk,
+            input = True,
+            stream_callback = self.callback,
+            start = False # le flux démarre seulement quand on appelle start()
+        )
+
+    def set_channels(self, channels):
+        # nouveau nombre de canaux: on rouvre le flux (les consommateurs abonnés sont conservés)
+        if channels == self.channels:
+            return
+        active = self.stream.is_active()
+        previous = self.channels
+        self.close()
+        try:
+            self.open(channels)
+        except (IOError, ValueError):
+            self.open(previous) # le périphérique refuse ce nombre de canaux: on garde l'ancien flux
+            raise
+        if active:
+            self.start()
+
+    def callback(self, in_data, frame_count, time_info, status):
+        # https://people.csail.mit.edu/hubert/pyaudio/docs/#pyaudio.PyAudio.open (stream_callback)
+        with self.callback_stage:
+            if status & PA_INPUT_OVERFLOW:
+                self.overflows += 1
+            self.ring.write(decode_planar(in_data, 2, self.channels)) # décodage sans copie: la seule copie est celle dans le tampon
+            self.last_callback = time.monotonic()
+        return (None, PA_CONTINUE)
+
+    def subscribe(self, consumer, active=None, stream=False):
+        # active est une fonction qui dit si le consommateur est utile en ce moment (ex: son tab est affiché)
+        # stream=True: le consommateur reçoit tous les échantillons arrivés depuis le tick précédent (sans trou
+        # ni doublon) au lieu de la dernière fenêtre de n échantillons
+        self.subscribers.append((consumer, active, stream))
+
+    def unsubscribe(self, consumer):
+        self.subscribers = [(c, active, stream) for c, active, stream in self.subscribers if c != consumer]
+
+    def read_new(self, pos):
+        # échantillons écrits entre la lecture en flux précédente et pos
+        new = pos - self.stream_pos
+        limit = self.ring.capacity - self.chunk # marge: le callback peut écrire pendant qu'on copie
+        if new > limit: # le tampon a fait un tour complet depuis la dernière lecture: les plus anciens sont perdus
+            self.lost_frames += new - limit
+            new = limit
+        self.stream_pos = pos
+        return self.ring.read(pos, new)
+
+    def dispatch(self, n):
+        # une seule lecture par tick, partagée par tous les consommateurs actifs:
+        # la forme d'onde et le spectre viennent donc exactement des mêmes échantillons
+        consumers = [(c, stream) for c, active, stream in self.subscribers if active is None or active()]
+        streaming = any(stream for _, stream in consumers)
+        if not streaming: # personne ne suit le flux: on repartira des échantillons les plus récents
+            self.stream_pos = self.ring.write_pos
+        if not consumers: # aucun consommateur visible: on ne lit même pas le tampon
+            return
+
+        with self.instrumentation.stage('lecture du tampon'):
+            data, pos = self.ring.latest(n)
+            if pos == self.read_pos:
+                self.underruns += 1
+            self.read_pos = pos
+            new = self.read_new(pos) if streaming else None
+
+        for consumer, stream in consumers:
+            with self.instrumentation.stage(consumer.__name__):
+                if stream:
+                    if new.shape[-1] > 0:
+                        consumer(new)
+                elif data.shape[-1] == n: # au démarrage, il n'y a pas encore assez d'échantillons pour une fenêtre
+                    consumer(data)
+
+    def start(self):
+        if not self.stream.is_active():
+            self.stream.start_stream()
+
+    def stop(self):
+        if self.stream.is_active():
+            self.stream.stop_stream()
+
+    def close(self):
+        self.stop()
+        self.stream.close()
@@ -0,0 +1,78 @@
+import numpy as np
+
+# la bande analysée ne dépasse pas quelques kHz, alors que le son est capturé à 44,1 kHz:
+# on filtre (passe-bas anti-repliement) puis on ne garde qu'un échantillon sur 'factor' avant la FFT.
+# pour une même résolution en fréquence, la FFT est 'factor' fois plus petite.
+
+def decimation_factor(rate, max_freq, margin=1.25, max_factor=None):
+    # le nouveau taux d'échantillonnage doit rester au-dessus de 2 * max_freq (théorème de Shannon),
+    # avec une marge pour la bande de transition du filtre. max_factor borne le facteur (et donc la longueur
+    # du filtre) quand max_freq est très bas; max_freq <= 0 (bande vide): pas de décimation
+    if max_freq <= 0:
+        return 1
+    factor = max(1, int(rate // (2 * max_freq * margin)))
+    return min(factor, max_factor) if max_factor else factor
+
+def lowpass_fir(numtaps, cutoff):
+    # https://en.wikipedia.org/wiki/Sinc_filter
+    # filtre à sinus cardinal fenêtré (Blackman), cutoff en fraction du taux d'échantillonnage
+    n = np.arange(numtaps) - (numtaps - 1) / 2
+    taps = 2 * cutoff * np.sinc(2 * cutoff * n) * np.blackman(numtaps)
+    return taps / taps.sum() # gain de 1 pour le continu
+
+class Decimator:
+    # max_taps: longueur maximale du filtre, ex: ce que le tampon circulaire de la capture peut fournir en plus d'un bloc
+    def __init__(self, rate, max_freq, taps_per_phase=16, max_taps=None):
+        self.factor = decimation_factor(rate, max_freq, max_factor=max(1, max_taps // taps_per_phase) if max_taps else None)
+        self.rate = rate / self.factor # taux d'échantillonnage après décimation
+
+        numtaps = self.factor * taps_per_phase
+        kernel = lowpass_fir(numtaps, 0.45 / self.factor)[::-1] # retourné: produit scalaire = convolution
+        # décomposition polyphase: la ligne q contient les factor coefficients appliqués au q-ième bloc de factor échantillons
+        self.phases = kernel.reshape(taps_per_phase, self.factor)
+        # nombre d'échantillons passés dont le filtre a besoin avant le premier échantillon à garder
+        self.history = numtaps - 1
+
+    def decimate(self, data):
+        # data contient self.history échantillons d'historique suivis des échantillons à décimer.
+        # on ne calcule le filtre qu'aux positions gardées (0, factor, 2 * factor...), comme un filtre polyphase:
+        # les (factor - 1) sorties sur factor qui seraient jetées ne sont jamais calculées.
+        # data peut contenir plusieurs canaux (channels, samples): le temps est toujours sur le dernier axe
+        data = np.asarray(data, dtype=np.float64)
+        if self.factor == 1:
+            return data[..., self.history:]
+        taps_per_phase = len(self.phases)
+        length = data.shape[-1]
+        count = (length - self.history - 1) // self.factor + 1 # nombre d'échantillons en sortie
+        num_blocks = count + taps_per_phase - 1
+        if length < num_blocks * self.factor:
+            data = np.pad(data, [(0, 0)] * (data.ndim - 1) + [(0, num_blocks * self.factor - length)])
+
+        # les blocs de factor échantillons forment une matrice contiguë (sans copie): un seul produit matriciel
+        # donne la contribution de chaque phase du filtre à chaque bloc, il reste à sommer les diagonales
+        blocks = data[..., :num_blocks * self.factor].reshape(data.shape[:-1] + (num_blocks, self.factor))
+        products = blocks @ self.phases.T
+        out = products[..., :count, 0].copy()
+        for q in range(1, taps_per_phase):
+            out += products[..., q:q + count, q]
+        return out
+
+class StreamingDecimator:
+    # décimation d'un flux qui arrive par morceaux (FFT glissante): l'historique du filtre et les échantillons
+    # qui ne complètent pas encore une sortie sont gardés d'un appel à l'autre, rien n'est filtré deux fois
+    def __init__(self, decimator, channels=1):
+        self.decimator = decimator
+        self.rate = decimator.rate
+        self.pending = np.zeros((channels, decimator.history))
+
+    def push(self, samples):
+        # samples: (channels, n) au taux d'origine; renvoie les nouveaux échantillons décimés (channels, m)
+        data = np.concatenate([self.pending, np.asarray(samples, dtype=np.float64)], axis=-1)
+        history, factor = self.decimator.history, self.decimator.factor
+        count = max(0, (data.shape[-1] - history - 1) // factor + 1) # sorties complètes disponibles
+        if count == 0:
+            self.pending = data
+            return data[..., :0]
+        out = self.decimator.decimate(data[..., :history + (count - 1) * factor + 1])
+        self.pending = data[..., count * factor:] # la prochaine sortie a besoin de history échantillons avant elle
+        return out
@@ -0,0 +1,48 @@
+import numpy as np
+
+# https://numpy.org/doc/stable/reference/generated/numpy.frombuffer.html
+# np.frombuffer interprète directement les octets comme un tableau numpy, sans créer d'objets Python
+# intermédiaires (contrairement à struct.unpack qui créait un int Python par échantillon).
+# les fichiers WAV stockent les échantillons en little-endian (<), entrelacés canal par canal:
+# [gauche0, droite0, gauche1, droite1, ...]
+PCM_DTYPES = {
+    1: np.uint8, # 8 bits: non signé, le silence vaut 128
+    2: np.dtype('<i2'), # 16 bits signé
+    4: np.dtype('<i4'), # 32 bits signé
+}
+
+# pleine échelle de chaque taille d'échantillon une fois décodé (le 8 bits est recentré autour de 0)
+FULL_SCALE = {1: 128, 2: 2**15, 3: 2**23, 4: 2**31}
+
+def decode_pcm(data, sampwidth, channels=1):
+    # renvoie un tableau de forme (frames, channels): data[:, 0] est une vue (sans copie) sur le premier canal
+    if sampwidth == 3:
+        samples = decode_int24(data)
+    elif sampwidth in PCM_DTYPES:
+        samples = np.frombuffer(data, dtype=PCM_DTYPES[sampwidth])
+        if sampwidth == 1:
+            samples = samples.astype(np.int16) - 128 # on recentre le 8 bits autour de 0
+    else:
+        raise ValueError(f"Nombre d'octets par échantillon non supporté: {sampwidth} octets.")
+
+    frames = len(samples) // channels
+    return samples[:frames * channels].reshape(frames, channels)
+
+def decode_int24(data):
+    # il n'existe pas de type numpy sur 3 octets: on place chaque échantillon dans les 3 octets de poids fort
+    # d'un int32 (l'octet de poids faible reste à 0), puis un décalage arithmétique de 8 bits remet la valeur
+    # à la bonne échelle en conservant le signe
+    raw = np.frombuffer(data, dtype=np.uint8)
+    raw = raw[:len(raw) // 3 * 3].reshape(-1, 3)
+    padded = np.zeros((len(raw), 4), dtype=np.uint8)
+    padded[:, 1:] = raw
+    return padded.view('<i4').ravel() >> 8
+
+def decode_channel(data, sampwidth, channels=1, channel=0):
+    # un seul canal, sous forme de vue à pas (stride) sur les échantillons entrelacés
+    return decode_pcm(data, sampwidth, channels)[:, channel]
+
+def decode_planar(data, sampwidth, channels=1):
+    # forme (channels, frames): transposée de decode_pcm, toujours sans copie. chaque canal est une ligne,
+    # ce qui permet de traiter tous les canaux d'un coup (np.fft.rfft(..., axis=-1) sur le tableau entier)
+    return decode_pcm(data, sampwidth, channels).T
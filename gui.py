@@ -0,0 +1,1159 @@
+from PySide6 import QtCore, QtWidgets
+from PySide6.QtWidgets import QTabWidget, QWidget, QVBoxLayout, QLabel, QMessageBox, QApplication
+import os, sys, time, numpy as np, struct, pyqtgraph as pg
+from capture import CaptureEngine
+from wavstream import MappedWav, stft_pitch, stft_plan, stft_frame_count, stft_params, spectrum_fundamentals
+from cache import SpectralCache, FileHasher
+from playback import PlaybackEngine
+from recorder import WavRecorder
+from sources import SourceBackend
+from instrumentation import Instrumentation, SamplingProfiler
+from decimation import Decimator
+from pitch import get_estimator
+from analyse import get_plan, get_zoom_plan, find_peak, candidate_stats, get_note_table
+from stft import SlidingStft
+from history import PitchHistory
+from render import CurveRenderer
+
+class AudioStream(QtWidgets.QWidget):
+    # source: entrée à la place du micro (voir sources.py), realtime: relecture au rythme du son,
+    # headless: sans affichage, l'appelant fait avancer la source avec step() (tous les traitements sont actifs)
+    def __init__(self, source=None, realtime=True, headless=False):
+        super().__init__()        
+        self.headless = headless
+
+        # https://stackoverflow.com/questions/69258587/change-qt-stylesheet-for-all-buttons-of-a-widget-on-button-press
+        # stylesheet pour l'app
+        QApplication.instance().setStyleSheet("""
+            QPushButton {
+                color: #fff;
+                background-color: #3972c7;
+                border-radius: 3px;
+                padding: 5px 10px;
+                width: auto;
+                font-size: 16px;
+            }
+                              
+            QPushButton:hover {
+                background-color: #3266b4;
+            }
+                              
+            QPushButton:pressed {
+                background-color: #2b5697;
+            }
+            """)
+        # tabs
+        self.tab_widget = QTabWidget()
+        
+        self.acquisitionTab = QWidget()
+        self.analyseTab = QWidget()
+        self.parametreTab = QWidget()
+        self.fichierTab = QWidget()
+
+        self.tab_widget.addTab(self.acquisitionTab, "Acquisition")
+        self.tab_widget.addTab(self.analyseTab, "Analyse")
+        self.tab_widget.addTab(self.fichierTab, "Fichier")
+        self.tab_widget.addTab(self.parametreTab, "Paramètres")
+
+        # https://people.csail.mit.edu/hubert/pyaudio/docs/#pyaudio.PyAudio.open
+        # parametres prise du son
+        self.chunk = 1024 # divise le flux en petit blocs de 1024 échantillons (= mesure de l'amplitude à un instant donné)
+        self.channels = 1  # 1 = mono (son n'est pas spatiale) / 2 = stéréo
+        self.rate = 44100  # taux d'échantillonnage (Hz) : nombre d'échantillons capturés par secondes
+                           # ici, 44 100 échantillons par seconde, donc chaque échantillon représente 1 / 44100 = ~22.7 µs de son
+
+        # entrée: le micro (PyAudio), ou une source sans carte son (fichier WAV rejoué, signal synthétique)
+        # avec une source, PortAudio n'est initialisé qu'à la première lecture d'un son (voir get_playback):
+        # en headless, aucun périphérique audio n'est jamais ouvert
+        self.audio = None
+        if source is not None:
+            self.rate = source.rate
+            self.input = SourceBackend(source, realtime=realtime, threaded=not headless)
+        else:
+            import pyaudio # importé ici, comme dans playback: seul le micro en a besoin
+            self.audio = pyaudio.PyAudio()  # création de l'objet PyAudio: gère l'entrée audio
+            self.input = self.audio
+
+        # flux audio: la capture tourne dans le thread de PortAudio et remplit un tampon circulaire,
+        # le timer de l'interface ne fait plus que lire la dernière fenêtre disponible
+        # mesures du chemin critique (durée de chaque étape, compteurs), affichées dans le panneau de performances
+        self.instrumentation = Instrumentation()
+        self.capture = CaptureEngine(self.input, rate=self.rate, channels=self.channels, chunk=self.chunk, instrumentation=self.instrumentation)
+        self.capture.start()
+        self.instrumentation.counter("débordements", lambda: self.capture.overflows)
+        self.instrumentation.counter("ticks sans données", lambda: self.capture.underruns)
+        self.instrumentation.counter("échantillons perdus", lambda: self.capture.lost_frames)
+        self.instrumentation.counter("depuis le dernier bloc (ms)", lambda: (time.monotonic() - self.capture.last_callback) * 1000 if self.capture.last_callback else float('nan'))
+        self.instrumentation.counter("blocs non enregistrés", lambda: self.recorder.dropped_chunks if self.recorder else 0)
+        self.instrumentation.rate("échantillons décodés", lambda: self.capture.ring.write_pos * self.capture.channels)
+        self.profiler = None
+
+        # lecture des sons (note détectée, fichier) en arrière-plan sur un flux de sortie ouvert une seule fois,
+        # à la première demande
+        self.playback = None
+
+        # button pause
+        self.pause_btn = QtWidgets.QPushButton("Pause ⏸️")
+        self.pause_btn.clicked.connect(self.pause)
+        self.pause_btn.setMaximumWidth(120)
+
+        self.tab_widget.currentChanged.connect(self.on_tab_change)
+        self.pause_state = False
+
+        layout = QtWidgets.QVBoxLayout(self) # créé un layout vertical
+        layout.addWidget(self.pause_btn)
+        layout.addWidget(self.tab_widget)
+
+        # panneau de performances (caché par défaut, voir le tab Paramètres), mis à jour deux fois par seconde
+        self.perf_label = QLabel()
+        self.perf_label.setStyleSheet("font-family: monospace; font-size: 12px;")
+        self.perf_label.hide()
+        layout.addWidget(self.perf_label)
+        self.perf_timer = QtCore.QTimer()
+        self.perf_timer.timeout.connect(lambda: self.perf_label.setText(self.instrumentation.report()))
+
+        # paramètres analyse après fft
+        # somme et nombre des fréquences candidates accumulées depuis la dernière moyenne (pas de liste qui grandit)
+        # une valeur par canal: tableaux numpy de self.channels valeurs (live) ou du nombre de canaux du fichier
+        self.candidates_sum = {}
+        self.candidates_count = {}
+        self.channel_freqs = {}
+        self.reset_channels('live', self.channels)
+        self.reset_channels('file', 1)
+        self.fundamental_freq = {'live': None, 'file': None} # premier canal détecté (son généré, historique)
+        self.fundamental_label = {'live': '', 'file': ''}
+        self.min_freq = 250
+        self.max_freq = 1100
+        self.decimator = None
+        self.engine = 'rfft'
+        self.estimator = None # None: moyenne des pics FFT sur plusieurs ticks (méthode d'origine)
+        self.stft = None # FFT glissante (None = une FFT par tick sur la dernière fenêtre)
+        self.note_table = get_note_table() # noms des notes et écart en cents (La4 = 440 Hz, notation française)
+
+        # historique des fréquences détectées en direct (taille fixe, les plus anciennes sont écrasées)
+        self.pitch_history = PitchHistory(capacity=500000, note_table=self.note_table) # ~4 h à une mesure par tick de 30 ms
+        self.history_duration = 30 # secondes affichées dans le graphique de l'historique
+        self.start_time = time.monotonic()
+
+        # cache sur disque des fichiers déjà analysés (~/.cache/analyse-audio, 512 Mo au maximum)
+        try:
+            self.spectral_cache = SpectralCache()
+        except OSError:
+            self.spectral_cache = None
+        self.file_hash = None # (chemin, hash du contenu) du fichier en cours d'analyse, pour l'enregistrer dans le cache
+        self.file_hasher = None # hash du contenu en cours de calcul (fichier absent de l'index du cache)
+        self.resolution = 1 # pas en Hz de la zoom FFT
+
+        self.tab_widget.currentChanged.connect(self.on_tab_change)
+        self.file_path = None
+
+        self.initTabAcquisition()
+        self.initTabAnalyse()
+        self.initTabFichier()
+        self.initTabParametres()
+
+        # les courbes ne reçoivent pas directement les données: elles passent par un CurveRenderer qui les réduit
+        # à quelques points par pixel, et qui ne redessine qu'au rythme de l'écran (timer de rafraîchissement)
+        # https://doc.qt.io/qtforpython-6/PySide6/QtGui/QScreen.html#PySide6.QtGui.QScreen.refreshRate
+        refresh_rate = QApplication.primaryScreen().refreshRate() or 60
+        stage = self.instrumentation.stage
+        self.acquisition_renderer = CurveRenderer(self.curve_acquisition, stage=stage("dessin: forme d'onde"))
+        self.analyse_renderer = CurveRenderer(self.curve_analyse, auto_range=True, stage=stage("dessin: spectre"))
+        self.history_renderer = CurveRenderer(self.history_curve, stage=stage("dessin: historique"))
+        self.file_renderer = CurveRenderer(self.file_curve, auto_range=True, stage=stage("dessin: fichier"))
+        self.file_pitch_renderer = CurveRenderer(self.file_pitch_curve, stage=stage("dessin: suivi fichier"))
+        self.renderers = [self.acquisition_renderer, self.analyse_renderer, self.history_renderer, self.file_renderer, self.file_pitch_renderer]
+
+        self.render_timer = QtCore.QTimer()
+        self.render_timer.timeout.connect(self.flush_renderers)
+        self.render_timer.start(int(1000 / refresh_rate))
+
+    def initTabAcquisition(self):
+        layout = QVBoxLayout(self.acquisitionTab)
+        plot = self.createPlotWidget(x_label="Temps (s)")
+        self.curve_acquisition = plot.plot(pen='cyan')  # on plot une ligne ou courbe qui contiendra les valeurs
+
+        # compteurs de la capture: blocs perdus par PortAudio et ticks sans nouvel échantillon
+        self.capture_stats_label = QLabel("Débordements: 0 | Ticks sans données: 0")
+
+        # https://doc.qt.io/qtforpython-5/PySide2/QtCore/QTimer.html
+        # timer: toutes les x secondes, on relit les derniers échantillons capturés
+        self.timer = QtCore.QTimer()
+        self.timer.timeout.connect(self.update_live)
+        self.timer.start(30) # toutes les 30ms
+
+        # enregistrement de la capture dans un fichier WAV (écrit en arrière-plan, réutilisable dans le tab Fichier)
+        self.recorder = None
+        self.record_btn = QtWidgets.QPushButton("Enregistrer ⏺️")
+        self.record_btn.setMaximumWidth(200)
+        self.record_btn.clicked.connect(self.toggle_recording)
+
+        layout.addWidget(plot)
+        layout.addWidget(self.capture_stats_label)
+        layout.addWidget(self.record_btn)
+
+        # la courbe n'est mise à jour que si le tab Acquisition est affiché
+        self.capture.subscribe(self.update_acquisition, active=lambda: self.is_shown(self.acquisitionTab) and not self.pause_state)
+        # l'enregistreur reçoit tous les échantillons (sans trou ni doublon), quel que soit le tab affiché
+        self.capture.subscribe(self.record_samples, active=lambda: self.recorder is not None, stream=True)
+
+    def initTabAnalyse(self):
+        layout = QtWidgets.QHBoxLayout(self.analyseTab)
+        plots_layout = QVBoxLayout() # spectre en haut, fondamentale au cours du temps en bas
+        plot = self.createPlotWidget(x_label="Fréquences (Hz)")
+        self.curve_analyse = plot.plot(pen='cyan')# on plot une ligne ou courbe qui contiendra les valeurs
+
+        # ligne pour la fréquence minimale
+        self.min_freq_line = pg.InfiniteLine(self.min_freq, angle=90, pen=pg.mkPen('g', width=2))
+        plot.addItem(self.min_freq_line)
+
+        # ligne pour la fréquence maximale
+        self.max_freq_line = pg.InfiniteLine(self.max_freq, angle=90, pen=pg.mkPen('y', width=2))
+        plot.addItem(self.max_freq_line)
+
+        # panel à droite pour afficher les fréquences détéctées
+        # https://doc.qt.io/qtforpython-5/PySide2/QtWidgets/QVBoxLayout.html
+        self.freq_panel = QWidget() # créé un widget pour montrer les fréquences
+        freq_layout = QVBoxLayout(self.freq_panel)
+        self.fundamental_label['live'] = QLabel(f"Fréquence fondamentale détéctée: \n {self.fundamental_freq['live']}")
+        self.fundamental_label['live'].setAlignment(QtCore.Qt.AlignCenter)
+        self.fundamental_label['live'].setStyleSheet("font-size: 30px;")
+        freq_layout.addWidget(self.fundamental_label['live']) # ajoute le label au layout
+
+        generate_sound_btn = QtWidgets.QPushButton("Générer le son")
+        generate_sound_btn.clicked.connect(lambda: self.generate_sound('live'))
+        freq_layout.addWidget(generate_sound_btn)
+
+        stop_sound_btn = QtWidgets.QPushButton("Arrêter le son")
+        stop_sound_btn.clicked.connect(self.stop_sound)
+        freq_layout.addWidget(stop_sound_btn)
+
+        export_history_btn = QtWidgets.QPushButton("Exporter l'historique")
+        export_history_btn.clicked.connect(self.export_history)
+        freq_layout.addWidget(export_history_btn)
+
+        # fondamentale détectée au cours des dernières secondes (0 = maintenant)
+        history_plot = self.createPlotWidget(x_label="Temps (s)", y_label="Fréquence fondamentale (Hz)")
+        history_plot.setYRange(0, 1200)
+        history_plot.setXRange(-self.history_duration, 0)
+        self.history_curve = history_plot.plot(pen=None, symbol='o', symbolSize=3, symbolBrush='cyan', symbolPen=None)
+
+        plots_layout.addWidget(plot, stretch=2)
+        plots_layout.addWidget(history_plot, stretch=1)
+        layout.addLayout(plots_layout, stretch=2) # prend 2/3 du tab
+        layout.addWidget(self.freq_panel, stretch=1) # prend 1/3 du tab
+
+        # la FFT n'est calculée que si le tab Analyse est affiché
+        # sans FFT glissante: analyse de la dernière fenêtre à chaque tick; avec: analyse de tous les nouveaux échantillons
+        self.capture.subscribe(self.update_analyse, active=lambda: self.is_shown(self.analyseTab) and not self.pause_state and self.stft is None)
+        self.capture.subscribe(self.update_analyse_stream, active=lambda: self.is_shown(self.analyseTab) and not self.pause_state and self.stft is not None, stream=True)
+
+    def initTabFichier(self):
+        layout = QtWidgets.QVBoxLayout(self.fichierTab) # layout vertical
+
+        # boutton pour ouvrir un fichier
+        open_file_btn = QtWidgets.QPushButton("Ouvrir un fichier audio")
+        open_file_btn.clicked.connect(self.open_file_dialog)
+        layout.addWidget(open_file_btn)
+
+        # horizontal layout for plot and frequency panel
+        h_layout = QtWidgets.QHBoxLayout()
+        
+        plot = self.createPlotWidget(x_label="Fréquences (Hz)")
+        self.file_curve = plot.plot(pen='cyan') # on plot une ligne ou courbe qui contiendra les valeurs
+        
+        self.freq_panel_file = QWidget() # créé un widget pour montrer les fréquences
+        freq_layout = QVBoxLayout(self.freq_panel_file) # créé un layout vertical pour le widget
+        self.fundamental_label['file'] = QLabel(f"Fréquence fondamentale détéctée: \n {self.fundamental_freq['file']}")
+        self.fundamental_label['file'].setAlignment(QtCore.Qt.AlignCenter)
+        self.fundamental_label['file'].setStyleSheet("font-size: 30px;")
+        freq_layout.addWidget(self.fundamental_label['file']) # ajoute le label au layout
+
+        generate_sound_btn = QtWidgets.QPushButton("Générer le son")
+        generate_sound_btn.clicked.connect(lambda: self.generate_sound('file'))
+        freq_layout.addWidget(generate_sound_btn)
+
+        generate_file_sound_btn = QtWidgets.QPushButton("Générer le son du fichier")
+        generate_file_sound_btn.clicked.connect(lambda: self.generate_file_sound())
+        freq_layout.addWidget(generate_file_sound_btn)
+
+        stop_sound_btn = QtWidgets.QPushButton("Arrêter le son")
+        stop_sound_btn.clicked.connect(self.stop_sound)
+        freq_layout.addWidget(stop_sound_btn)
+    
+        h_layout.addWidget(plot, stretch=2) # prend 2/3 du tab
+        h_layout.addWidget(self.freq_panel_file, stretch=1) # prend 1/3 du tab
+
+        layout.addLayout(h_layout, stretch=2)
+
+        # fréquence fondamentale au cours du temps, remplie au fur et à mesure de l'analyse du fichier
+        pitch_plot = self.createPlotWidget(x_label="Temps (s)", y_label="Fréquence fondamentale (Hz)")
+        pitch_plot.setYRange(0, 1200)
+        self.file_pitch_curve = pitch_plot.plot(pen=None, symbol='o', symbolSize=3, symbolBrush='cyan', symbolPen=None)
+        layout.addWidget(pitch_plot, stretch=1)
+
+        # le fichier est analysé par blocs, un bloc à chaque tour de la boucle d'événements Qt:
+        # l'interface reste réactive et les résultats s'affichent pendant que le reste du fichier est traité
+        self.file_timer = QtCore.QTimer()
+        self.file_timer.timeout.connect(self.process_file_block)
+        self.file_analysis = None
+
+    def initTabParametres(self):
+        layout = QVBoxLayout(self.parametreTab)
+
+        # https://doc.qt.io/qtforpython-5/PySide2/QtWidgets/QSlider.html
+        # slider pour la fréquence minimale
+        self.min_freq_slider = QtWidgets.QSlider(QtCore.Qt.Horizontal)
+
+        #https://doc.qt.io/qt-6/stylesheet-examples.html#customizing-qslider
+        self.min_freq_slider.setStyleSheet("""
+
+            QSlider::groove:horizontal {
+                border: 1px solid #bbb;
+                background: white;
+                height: 10px;
+                border-radius: 4px;
+            }
+
+            QSlider::sub-page:horizontal {
+                background: qlineargradient(x1: 0, y1: 0, x2: 0, y2: 1,
+                    stop: 0 #66e, stop: 1 #bbf);
+                background: qlineargradient(x1: 0, y1: 0.2, x2: 1, y2: 1,
+                    stop: 0 #bbf, stop: 1 #55f);
+                border: 1px solid #777;
+                height: 10px;
+                border-radius: 4px;
+            }
+
+            QSlider::add-page:horizontal {
+                background: #fff;
+                border: 1px solid #777;
+                height: 10px;
+                border-radius: 4px;
+            }
+
+            QSlider::handle:horizontal {
+                background: qlineargradient(x1:0, y1:0, x2:1, y2:1,
+                    stop:0 #eee, stop:1 #ccc);
+                border: 1px solid #777;
+                width: 13px;
+                margin-top: -2px;
+                margin-bottom: -2px;
+                border-radius: 4px;
+            }
+
+            QSlider::handle:horizontal:hover {
+                background: qlineargradient(x1:0, y1:0, x2:1, y2:1,
+                    stop:0 #fff, stop:1 #ddd);
+                border: 1px solid #444;
+                border-radius: 4px;
+            }
+
+            QSlider::sub-page:horizontal:disabled {
+                background: #bbb;
+                border-color: #999;
+            }
+
+            QSlider::add-page:horizontal:disabled {
+                background: #eee;
+                border-color: #999;
+            }
+
+            QSlider::handle:horizontal:disabled {
+                background: #eee;
+                border: 1px solid #aaa;
+                border-radius: 4px;
+            }                           
+        """)
+
+        self.min_freq_slider.setMinimum(0)
+        self.min_freq_slider.setMaximum(3000)
+        self.min_freq_slider.setValue(self.min_freq)
+        self.min_freq_slider.setTickPosition(QtWidgets.QSlider.TicksBelow)
+        self.min_freq_slider.setTickInterval(100)
+        self.min_freq_slider.valueChanged.connect(self.update_min_freq)
+
+        # slider pour la fréquence maximale
+        self.max_freq_slider = QtWidgets.QSlider(QtCore.Qt.Horizontal)
+        self.max_freq_slider.setStyleSheet("""
+            QSlider::groove:horizontal {
+                border: 1px solid #bbb;
+                background: white;
+                height: 10px;
+                border-radius: 4px;
+            }
+
+            QSlider::sub-page:horizontal {
+                background: qlineargradient(x1: 0, y1: 0,    x2: 0, y2: 1,
+                    stop: 0 #66e, stop: 1 #bbf);
+                background: qlineargradient(x1: 0, y1: 0.2, x2: 1, y2: 1,
+                    stop: 0 #bbf, stop: 1 #55f);
+                border: 1px solid #777;
+                height: 10px;
+                border-radius: 4px;
+            }
+
+            QSlider::add-page:horizontal {
+                background: #fff;
+                border: 1px solid #777;
+                height: 10px;
+                border-radius: 4px;
+            }
+
+            QSlider::handle:horizontal {
+                background: qlineargradient(x1:0, y1:0, x2:1, y2:1,
+                    stop:0 #eee, stop:1 #ccc);
+                border: 1px solid #777;
+                width: 13px;
+                margin-top: -2px;
+                margin-bottom: -2px;
+                border-radius: 4px;
+            }
+
+            QSlider::handle:horizontal:hover {
+                background: qlineargradient(x1:0, y1:0, x2:1, y2:1,
+                    stop:0 #fff, stop:1 #ddd);
+                border: 1px solid #444;
+                border-radius: 4px;
+            }
+
+            QSlider::sub-page:horizontal:disabled {
+                background: #bbb;
+                border-color: #999;
+            }
+
+            QSlider::add-page:horizontal:disabled {
+                background: #eee;
+                border-color: #999;
+            }
+
+            QSlider::handle:horizontal:disabled {
+                background: #eee;
+                border: 1px solid #aaa;
+                border-radius: 4px;
+            }                           
+        """)
+
+        self.max_freq_slider.setMinimum(0)
+        self.max_freq_slider.setMaximum(3000)
+        self.max_freq_slider.setValue(self.max_freq)
+        self.max_freq_slider.setTickPosition(QtWidgets.QSlider.TicksBelow)
+        self.max_freq_slider.setTickInterval(100)
+        self.max_freq_slider.valueChanged.connect(self.update_max_freq)
+
+        self.min_freq_label = QLabel(f"Fréquence minimale: {self.min_freq} Hz")
+        self.max_freq_label = QLabel(f"Fréquence maximale: {self.max_freq} Hz")
+        self.min_freq_label.setStyleSheet("font-size: 30px;")
+        self.max_freq_label.setStyleSheet("font-size: 30px;")
+
+        # bouton pour reset les paramètres par défaut
+        reset_btn = QtWidgets.QPushButton("Mettre les paramètres par défaut")
+        reset_btn.setFixedWidth(250)
+        reset_btn.clicked.connect(self.reset_parameters)
+
+        layout.addWidget(reset_btn, alignment=QtCore.Qt.AlignRight)
+        layout.addWidget(self.min_freq_label)
+        layout.addWidget(self.min_freq_slider)
+        layout.addWidget(self.max_freq_label)
+        layout.addWidget(self.max_freq_slider)
+
+        # décimation: filtre passe-bas puis sous-échantillonnage juste au-dessus de 2 * max_freq avant la FFT
+        self.decimation_checkbox = QtWidgets.QCheckBox("Décimer le signal avant la FFT (FFT plus petite, même résolution)")
+        self.decimation_checkbox.setStyleSheet("font-size: 20px;")
+        self.decimation_checkbox.toggled.connect(self.update_decimator)
+        layout.addWidget(self.decimation_checkbox)
+
+        # nombre de canaux capturés (limité à ce que permet le périphérique d'entrée par défaut)
+        channels_layout = QtWidgets.QHBoxLayout()
+        channels_label = QLabel("Canaux d'entrée:")
+        channels_label.setStyleSheet("font-size: 20px;")
+        self.channels_spinbox = QtWidgets.QSpinBox()
+        try:
+            # https://people.csail.mit.edu/hubert/pyaudio/docs/#pyaudio.PyAudio.get_default_input_device_info
+            max_channels = int(self.input.get_default_input_device_info()['maxInputChannels'])
+        except (IOError, KeyError):
+            max_channels = 1
+        self.channels_spinbox.setRange(1, max(1, max_channels))
+        self.channels_spinbox.setValue(self.channels)
+        self.channels_spinbox.valueChanged.connect(self.update_channels)
+        channels_layout.addWidget(channels_label)
+        channels_layout.addWidget(self.channels_spinbox)
+        channels_layout.addStretch()
+        layout.addLayout(channels_layout)
+
+        # moteur spectral: FFT sur toute la bande, ou zoom FFT (chirp-z) uniquement entre min_freq et max_freq
+        engine_layout = QtWidgets.QHBoxLayout()
+        engine_label = QLabel("Moteur spectral:")
+        engine_label.setStyleSheet("font-size: 20px;")
+        self.engine_combo = QtWidgets.QComboBox()
+        self.engine_combo.addItem("FFT (toute la bande)", 'rfft')
+        self.engine_combo.addItem("Zoom FFT (chirp-z, bande min-max)", 'czt')
+        self.engine_combo.currentIndexChanged.connect(self.update_engine)
+
+        # https://doc.qt.io/qtforpython-6/PySide6/QtWidgets/QDoubleSpinBox.html
+        self.resolution_spinbox = QtWidgets.QDoubleSpinBox()
+        self.resolution_spinbox.setRange(0.1, 20)
+        self.resolution_spinbox.setSingleStep(0.5)
+        self.resolution_spinbox.setValue(self.resolution)
+        self.resolution_spinbox.setSuffix(" Hz")
+        self.resolution_spinbox.setEnabled(False) # seulement utile pour la zoom FFT
+        self.resolution_spinbox.valueChanged.connect(self.update_engine)
+
+        engine_layout.addWidget(engine_label)
+        engine_layout.addWidget(self.engine_combo)
+        engine_layout.addWidget(QLabel("Résolution:"))
+        engine_layout.addWidget(self.resolution_spinbox)
+        engine_layout.addStretch()
+        layout.addLayout(engine_layout)
+
+        # notation des notes détectées: fréquence de référence du La4 et noms français (Do Ré Mi) ou anglais (C D E)
+        notes_layout = QtWidgets.QHBoxLayout()
+        notes_label = QLabel("Notation:")
+        notes_label.setStyleSheet("font-size: 20px;")
+        self.a4_spinbox = QtWidgets.QDoubleSpinBox()
+        self.a4_spinbox.setRange(400, 480)
+        self.a4_spinbox.setSingleStep(1)
+        self.a4_spinbox.setValue(440)
+        self.a4_spinbox.setSuffix(" Hz")
+        self.a4_spinbox.valueChanged.connect(self.update_note_table)
+        self.note_names_combo = QtWidgets.QComboBox()
+        self.note_names_combo.addItem("Do Ré Mi", 'fr')
+        self.note_names_combo.addItem("C D E", 'en')
+        self.note_names_combo.currentIndexChanged.connect(self.update_note_table)
+        notes_layout.addWidget(notes_label)
+        notes_layout.addWidget(QLabel("La4:"))
+        notes_layout.addWidget(self.a4_spinbox)
+        notes_layout.addWidget(self.note_names_combo)
+        notes_layout.addStretch()
+        layout.addLayout(notes_layout)
+
+        # méthode de détection de la fondamentale en direct
+        pitch_layout = QtWidgets.QHBoxLayout()
+        pitch_label = QLabel("Détection de la fondamentale:")
+        pitch_label.setStyleSheet("font-size: 20px;")
+        self.pitch_combo = QtWidgets.QComboBox()
+        self.pitch_combo.addItem("Moyenne des pics FFT sur plusieurs ticks", None)
+        self.pitch_combo.addItem("YIN (une seule fenêtre)", 'yin')
+        self.pitch_combo.addItem("Autocorrélation (une seule fenêtre)", 'acf')
+        self.pitch_combo.addItem("Produit spectral harmonique (une seule fenêtre)", 'hps')
+        self.pitch_combo.addItem("Pic FFT interpolé (une seule fenêtre)", 'fft')
+        self.pitch_combo.currentIndexChanged.connect(self.update_estimator)
+        pitch_layout.addWidget(pitch_label)
+        pitch_layout.addWidget(self.pitch_combo)
+        pitch_layout.addStretch()
+        layout.addLayout(pitch_layout)
+
+        # FFT glissante: taille de fenêtre, décalage (hop) entre deux trames et fenêtre de pondération
+        stft_layout = QtWidgets.QHBoxLayout()
+        self.stft_checkbox = QtWidgets.QCheckBox("FFT glissante (STFT)")
+        self.stft_checkbox.setStyleSheet("font-size: 20px;")
+        self.stft_window_combo = QtWidgets.QComboBox()
+        for size in (1024, 2048, 4096, 8192):
+            self.stft_window_combo.addItem(f"{size} échantillons", size)
+        self.stft_window_combo.setCurrentIndex(1)
+        self.stft_hop_spinbox = QtWidgets.QSpinBox()
+        self.stft_hop_spinbox.setRange(64, 2048) # au plus la taille de la fenêtre (mis à jour dans update_stft)
+        self.stft_hop_spinbox.setSingleStep(64)
+        self.stft_hop_spinbox.setValue(512)
+        self.stft_hop_spinbox.setSuffix(" échantillons")
+        self.stft_function_combo = QtWidgets.QComboBox()
+        self.stft_function_combo.addItem("Hann", 'hann')
+        self.stft_function_combo.addItem("Hamming", 'hamming')
+        self.stft_function_combo.addItem("Blackman", 'blackman')
+        self.stft_function_combo.addItem("Rectangulaire", None)
+
+        self.stft_checkbox.toggled.connect(self.update_stft)
+        self.stft_window_combo.currentIndexChanged.connect(self.update_stft)
+        self.stft_hop_spinbox.valueChanged.connect(self.update_stft)
+        self.stft_function_combo.currentIndexChanged.connect(self.update_stft)
+
+        stft_layout.addWidget(self.stft_checkbox)
+        stft_layout.addWidget(QLabel("Fenêtre:"))
+        stft_layout.addWidget(self.stft_window_combo)
+        stft_layout.addWidget(QLabel("Hop:"))
+        stft_layout.addWidget(self.stft_hop_spinbox)
+        stft_layout.addWidget(self.stft_function_combo)
+        stft_layout.addStretch()
+        layout.addLayout(stft_layout)
+
+        # performances: panneau des mesures, export en JSON et profileur par échantillonnage de la session
+        perf_layout = QtWidgets.QHBoxLayout()
+        self.perf_checkbox = QtWidgets.QCheckBox("Afficher les performances")
+        self.perf_checkbox.setStyleSheet("font-size: 20px;")
+        self.perf_checkbox.toggled.connect(self.toggle_perf_panel)
+        export_perf_btn = QtWidgets.QPushButton("Exporter les mesures")
+        export_perf_btn.clicked.connect(self.export_perf)
+        self.profiler_btn = QtWidgets.QPushButton("Démarrer le profileur")
+        self.profiler_btn.clicked.connect(self.toggle_profiler)
+        perf_layout.addWidget(self.perf_checkbox)
+        perf_layout.addWidget(export_perf_btn)
+        perf_layout.addWidget(self.profiler_btn)
+        perf_layout.addStretch()
+        layout.addLayout(perf_layout)
+
+    def update_live(self):
+        # on lit une seule fois les self.chunk derniers échantillons du tampon circulaire (lecture non bloquante)
+        # puis on les distribue aux consommateurs dont le tab est affiché
+        # avec la décimation, le filtre a besoin de quelques échantillons d'historique en plus
+        # en pause, les graphiques sont figés (consommateurs inactifs) mais l'enregistrement continue sans trou
+        history = self.decimator.history if self.decimator else 0
+        with self.instrumentation.stage('tick'):
+            self.capture.dispatch(self.chunk + history)
+
+    def is_shown(self, tab):
+        # sans affichage (headless), tous les tabs live sont traités
+        return self.headless or self.tab_widget.currentWidget() is tab
+
+    def clock(self):
+        # instant (s) des mesures de l'historique; headless: temps de la source (reproductible même plus vite que le temps réel)
+        if self.headless:
+            return self.capture.ring.write_pos / self.rate
+        return time.monotonic() - self.start_time
+
+    def step(self):
+        # headless: un bloc de la source passe par la capture puis par tous les consommateurs, comme à chaque tick
+        # du timer (autant de ticks que de blocs: rien n'est sauté, même plus vite que le temps réel)
+        if not self.capture.stream.step():
+            return False
+        self.update_live()
+        return True
+
+    def flush_renderers(self):
+        for renderer in self.renderers:
+            renderer.flush()
+
+    def update_acquisition(self, data_table):
+        # data_table: (channels, samples); la forme d'onde affichée est celle du premier canal
+        self.acquisition_renderer.set_data(y=data_table[0, -self.chunk:]) # mise à jour des valeurs du plot (au prochain rafraîchissement)
+        stats = f"Débordements: {self.capture.overflows} | Ticks sans données: {self.capture.underruns} | Échantillons perdus: {self.capture.lost_frames}"
+        if self.recorder is not None:
+            stats += f" | Enregistrement: {self.recorder.duration:.1f} s, file d'écriture: {self.recorder.queue_depth}, blocs perdus: {self.recorder.dropped_chunks}"
+        self.capture_stats_label.setText(stats)
+
+    def record_samples(self, new_samples):
+        if self.recorder.error is not None: # disque plein, fichier à 4 Gio...: on arrête et on l'explique tout de suite
+            self.stop_recording()
+            return
+        self.recorder.write(new_samples) # ne bloque jamais: le bloc est perdu (et compté) si la file est pleine
+
+    def toggle_recording(self):
+        if self.recorder is None:
+            # https://doc.qt.io/qtforpython-6/PySide6/QtWidgets/QFileDialog.html#PySide6.QtWidgets.QFileDialog.getSaveFileName
+            path, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Enregistrer la capture", "enregistrement.wav", "Audio Files (*.wav)")
+            if not path:
+                return
+            try:
+                self.recorder = WavRecorder(path, self.rate, self.channels)
+            except OSError as e:
+                self.show_error_message(f"Erreur lors de la création du fichier: {e}")
+                return
+            self.channels_spinbox.setEnabled(False) # le format du fichier est fixé au début de l'enregistrement
+            self.record_btn.setText("Arrêter l'enregistrement ⏹️")
+        else:
+            self.stop_recording()
+
+    def stop_recording(self):
+        recorder, self.recorder = self.recorder, None
+        recorder.close() # attend l'écriture des derniers blocs et met à jour l'en-tête
+        self.channels_spinbox.setEnabled(True)
+        self.record_btn.setText("Enregistrer ⏺️")
+        if recorder.error is not None:
+            self.show_error_message(f"Erreur lors de l'enregistrement: {recorder.error}")
+        elif recorder.dropped_chunks:
+            self.show_error_message(f"{recorder.dropped_chunks} blocs n'ont pas pu être écrits à temps (disque trop lent).")
+
+    def update_analyse(self, data_table):
+        if self.decimator:
+            freqs, fft_data = self.analyse_fft(self.decimator.decimate(data_table), 'live', self.decimator.rate)
+        else:
+            freqs, fft_data = self.analyse_fft(data_table[:, -self.chunk:], 'live') # fft
+        self.analyse_renderer.set_data(x=freqs, y=fft_data.mean(axis=0)) # spectre moyen des canaux
+
+    def update_analyse_stream(self, new_samples):
+        # FFT glissante: une trame tous les hop échantillons, en réutilisant le chevauchement avec les précédentes
+        # (décimée au fil de l'eau si la décimation est cochée, calculée par la zoom FFT si ce moteur est choisi)
+        resolution = self.resolution if self.engine == 'czt' else None
+        with self.instrumentation.stage('fft'):
+            plan, times, spectra = self.stft.push(new_samples, self.rate, self.min_freq, self.max_freq, resolution)
+        if spectra.shape[1] == 0: # spectra: (channels, trames, bins), pas encore de nouvelle trame complète
+            return
+        with self.instrumentation.stage('fondamentale'):
+            if self.estimator is not None:
+                # estimateur choisi: sur la trame la plus récente de chaque canal, au taux de la FFT glissante
+                self.analyse_pitch(self.stft.last_frame, plan.rate)
+            else:
+                # fondamentale de chaque canal: dernier pic valide parmi les nouvelles trames (interpolé entre les bins)
+                freqs, _ = find_peak(plan, spectra) # (channels, trames)
+                valid = ~np.isnan(freqs)
+                last = freqs.shape[-1] - 1 - np.argmax(valid[:, ::-1], axis=-1)
+                self.set_fundamentals('live', np.where(valid.any(axis=-1), freqs[np.arange(len(freqs)), last], np.nan), 1.0)
+        self.analyse_renderer.set_data(x=plan.freqs, y=spectra[:, -1].mean(axis=0)) # trame la plus récente, moyenne des canaux
+
+    def process_file(self, file_path):
+        try:
+            # projection du fichier en mémoire: rien n'est lu tant qu'on n'en a pas besoin
+            wav = MappedWav(file_path)
+        except (OSError, ValueError, struct.error) as e:
+            self.show_error_message(f"Erreur lors de l'ouverture du fichier: {e}")
+            return
+
+        self.file_window = 4096 # nombre d'échantillons par fenêtre de la FFT courte (~93 ms à 44,1 kHz)
+        self.file_rate = wav.rate
+        self.file_decimator = Decimator(wav.rate, self.max_freq) if self.decimation_checkbox.isChecked() else None
+        # plan fixé pour tout le fichier: déplacer un slider pendant l'analyse ne change ni la bande des blocs
+        # suivants, ni celle du résultat enregistré dans le cache sous file_params
+        self.file_plan = stft_plan(wav.rate, self.min_freq, self.max_freq, self.file_window, self.file_decimator)
+        self.file_spectrum_sum = np.zeros((wav.channels, len(self.file_plan.freqs)))
+        self.file_spectrum_count = 0
+        # suivi de la fondamentale préalloué (le nombre de fenêtres est connu): pas de concaténation à chaque bloc
+        num_windows = stft_frame_count(wav.num_frames, self.file_window, self.file_window // 2)
+        self.file_times = np.full(num_windows, np.nan)
+        self.file_pitches = np.full((wav.channels, num_windows), np.nan)
+        self.file_done = 0
+        self.reset_channels('file', wav.channels)
+
+        # fichier déjà analysé avec les mêmes paramètres: on relit le résultat du cache au lieu de tout recalculer
+        self.file_params = stft_params(wav.rate, self.min_freq, self.max_freq, self.file_window, self.file_window // 2, self.file_decimator)
+        # retrouvé par le chemin sans relire le fichier; sinon (premier essai, fichier renommé, copié ou touché) le
+        # hash du contenu est calculé petit à petit pendant l'analyse, deux fois plus vite qu'elle: si une entrée
+        # existe pour ce contenu, elle remplace l'analyse avant sa moitié (process_file_hash)
+        self.close_file_hasher()
+        self.file_hash, cached = None, None
+        if self.spectral_cache:
+            try:
+                file_hash, cached = self.spectral_cache.lookup_known(file_path, self.file_params)
+                if file_hash:
+                    self.file_hash = (file_path, file_hash)
+                else:
+                    self.file_hasher = FileHasher(file_path)
+                    blocks = -(-num_windows // 64) # nombre de blocs d'analyse
+                    self.file_hash_step = max(1 << 16, -(-os.path.getsize(file_path) // max(1, blocks // 2)))
+            except OSError:
+                self.close_file_hasher() # le cache n'est qu'une optimisation: on refait l'analyse
+        if cached:
+            self.file_timer.stop()
+            self.file_analysis = None
+            self.file_hash = None
+            self.show_cached_file(cached)
+            return
+
+        self.file_analysis = stft_pitch(wav, self.min_freq, self.max_freq, window=self.file_window, hop=self.file_window // 2,
+                                        block=64, decimator=self.file_decimator)
+        self.file_timer.start(0)
+
+    def show_cached_file(self, cached):
+        self.file_renderer.set_data(x=cached['freqs'], y=np.atleast_2d(cached['spectrum']).mean(axis=0)) # spectre moyen des canaux
+        self.show_file_pitches(cached['times'], cached['pitches'])
+        self.set_fundamentals('file', np.array(cached['fundamentals'], dtype=float)) # None -> nan
+
+    def finish_file(self):
+        # fin de l'analyse: fondamentale du spectre moyen complet, puis enregistrement dans le cache
+        self.file_timer.stop()
+        self.file_analysis = None
+        plan = self.file_plan
+        spectrum = self.file_spectrum_sum / self.file_spectrum_count
+        fundamentals = spectrum_fundamentals(plan, spectrum)
+        self.set_fundamentals('file', np.array(fundamentals, dtype=float))
+
+        if self.file_hasher:
+            # l'analyse a fini avant le hash (fichier très court): il ne reste que quelques morceaux à lire
+            try:
+                path = self.file_hasher.file.name
+                self.file_hash = (path, self.file_hasher.finish())
+            except OSError:
+                self.file_hash = None
+            self.file_hasher = None
+
+        if self.file_hash:
+            try:
+                self.spectral_cache.store(*self.file_hash, self.file_params, {
+                    'times': self.file_times, 'pitches': self.file_pitches, 'freqs': plan.freqs,
+                    'spectrum': spectrum, 'fundamentals': fundamentals})
+            except OSError:
+                pass # le cache n'est qu'une optimisation: l'analyse est déjà affichée
+            self.file_hash = None
+
+    def process_file_block(self):
+        try:
+            times, pitches, spectrum_sum, count = next(self.file_analysis)
+        except StopIteration:
+            self.finish_file()
+            return
+        except Exception as e:
+            self.file_timer.stop()
+            self.file_analysis = None
+            self.file_hash = None # rien à enregistrer dans le cache
+            self.close_file_hasher()
+            self.show_error_message(f"Erreur lors du traitement du fichier: {e}")
+            return
+
+        self.file_times[self.file_done:self.file_done + count] = times
+        self.file_pitches[:, self.file_done:self.file_done + count] = pitches
+        self.file_done += count
+        self.file_spectrum_sum += spectrum_sum
+        self.file_spectrum_count += count
+
+        # spectre moyen des fenêtres déjà analysées
+        plan = self.file_plan
+        fft_data = self.file_spectrum_sum / self.file_spectrum_count
+        self.analyse_spectrum(plan, fft_data, 'file')
+        self.file_renderer.set_data(x=plan.freqs, y=fft_data.mean(axis=0)) # spectre moyen des canaux
+        self.show_file_pitches(self.file_times[:self.file_done], self.file_pitches[:, :self.file_done])
+        if self.file_hasher:
+            self.process_file_hash()
+
+    def process_file_hash(self):
+        # un morceau du hash par bloc d'analyse; une fois le hash complet, on cherche une entrée pour ce contenu
+        try:
+            if self.file_hasher.update(self.file_hash_step):
+                return
+            path = self.file_hasher.file.name
+            file_hash = self.file_hasher.finish()
+            self.file_hasher = None
+            self.file_hash = (path, file_hash)
+            cached = self.spectral_cache.lookup_hash(path, file_hash, self.file_params)
+        except OSError:
+            self.close_file_hasher() # pas de hash: l'analyse continue, sans enregistrement dans le cache
+            return
+        if cached:
+            # même contenu déjà analysé (fichier renommé, copié ou touché): on arrête l'analyse et on affiche le cache
+            self.file_timer.stop()
+            self.file_analysis = None
+            self.file_hash = None
+            self.show_cached_file(cached)
+
+    def close_file_hasher(self):
+        if self.file_hasher:
+            self.file_hasher.close()
+            self.file_hasher = None
+
+    def show_file_pitches(self, times, pitches):
+        # nuage de points: les fondamentales de tous les canaux sur le même graphique
+        self.file_pitch_renderer.set_data(x=np.tile(times, len(pitches)), y=np.ravel(pitches))
+
+    def analyse_fft(self, data_table, mode='live', rate=None):
+        # plan d'analyse mis en cache: l'axe des fréquences (rfftfreq) et la bande [min_freq, max_freq]
+        # ne sont recalculés que si la taille, le taux d'échantillonnage ou les fréquences min/max changent
+        # avec la zoom FFT, seule la bande [min_freq, max_freq] est calculée, avec un pas de self.resolution Hz
+        if self.engine == 'czt':
+            plan = get_zoom_plan(data_table.shape[-1], rate or self.rate, self.min_freq, self.max_freq, self.resolution)
+        else:
+            plan = get_plan(data_table.shape[-1], rate or self.rate, self.min_freq, self.max_freq)
+
+        # transformée de Fourier (FFT)
+        # https://numpy.org/doc/2.1/reference/generated/numpy.fft.rfft.html
+        # on utilise rfft car data contient des nombres réels (pas complexes).
+        # data_table a la forme (channels, samples): une seule FFT en lot (axis=-1) pour tous les canaux
+        with self.instrumentation.stage('fft'):
+            fft_data = plan.spectrum(data_table)
+        with self.instrumentation.stage('fondamentale'):
+            if self.estimator is not None and mode == 'live':
+                self.analyse_pitch(data_table, rate or self.rate, mode)
+            else:
+                self.analyse_spectrum(plan, fft_data, mode)
+        return plan.freqs, fft_data
+
+    def analyse_pitch(self, data_table, rate, mode='live'):
+        # estimateur sur une seule fenêtre: le label est à jour dès le tick courant, sans attendre plusieurs mesures
+        # (une fenêtre par canal: les estimateurs acceptent un lot de fenêtres)
+        freqs, confidences = self.estimator.estimate(data_table, rate)
+        self.set_fundamentals(mode, freqs, confidences)
+
+    def analyse_spectrum(self, plan, fft_data, mode='live'):
+        # on garde les fréquences de la bande dont l'amplitude est supérieure à 3 fois le bruit moyen (pour chaque canal)
+        sums, counts = candidate_stats(plan, fft_data)
+        if len(sums) != len(self.candidates_sum[mode]): # le nombre de canaux a changé
+            self.reset_channels(mode, len(sums))
+        self.candidates_sum[mode] += sums
+        self.candidates_count[mode] += counts
+
+        # pour avoir une valeur représentative, on fait la moyenne de 3 fréquences mesurées
+        ready = self.candidates_count[mode] > 3
+        if ready.any():
+            freqs = np.where(ready, self.candidates_sum[mode] / np.maximum(self.candidates_count[mode], 1), np.nan)
+            self.candidates_sum[mode][ready] = 0.0
+            self.candidates_count[mode][ready] = 0
+            self.set_fundamentals(mode, freqs)
+
+    def reset_channels(self, mode, channels):
+        self.candidates_sum[mode] = np.zeros(channels)
+        self.candidates_count[mode] = np.zeros(channels, dtype=int)
+        self.channel_freqs[mode] = np.full(channels, np.nan)
+
+    def set_fundamentals(self, mode, freqs, confidences=np.nan):
+        # nouvelles fondamentales par canal (nan: rien de détecté, on garde la valeur précédente du canal)
+        freqs = np.atleast_1d(freqs)
+        valid = ~np.isnan(freqs) & (freqs > 0)
+        if not valid.any():
+            return
+        if len(freqs) != len(self.channel_freqs[mode]):
+            self.reset_channels(mode, len(freqs))
+        self.channel_freqs[mode] = np.where(valid, freqs, self.channel_freqs[mode])
+        first = np.argmax(valid)
+        self.fundamental_freq[mode] = float(freqs[first])
+        self.update_fundamental_label(mode, float(np.broadcast_to(confidences, freqs.shape)[first]))
+
+    def update_fundamental_label(self, mode, confidence=np.nan):
+        label = self.fundamental_label[mode]
+        freqs = self.channel_freqs[mode]
+
+        # on met à jour le label avec la fréquence fondamentale détéctée (note la plus proche et écart en cents)
+        if len(freqs) == 1:
+            freq = self.fundamental_freq[mode]
+            note, cents = self.note_table.describe(freq)
+            label.setText(f"Fréquence fondamentale détéctée: \n {freq:.2f} Hz ({note}, {cents:+.0f} cents)")
+        else:
+            # plusieurs canaux: une colonne par canal, côte à côte (texte enrichi: tableau HTML)
+            # https://doc.qt.io/qt-6/richtext-html-subset.html
+            notes = [self.note_table.describe(freq) for freq in freqs]
+            columns = "".join(f"<td align='center'>Canal {i + 1}<br>" + (f"{freq:.2f} Hz<br>({note}, {cents:+.0f} cents)" if note is not None else "-<br>")
+                              + "</td>" for i, (freq, (note, cents)) in enumerate(zip(freqs, notes)))
+            label.setText(f"Fréquences fondamentales détéctées:<table width='100%' cellspacing='10'><tr>{columns}</tr></table>")
+
+        if mode == 'live': # chaque fréquence détectée en direct est gardée dans l'historique
+            self.pitch_history.append(self.clock(), self.fundamental_freq[mode], confidence)
+            self.update_history_plot()
+
+    def update_history_plot(self):
+        # seules les dernières secondes sont affichées, avec au plus ~2000 points (un point par pixel environ)
+        now = self.clock()
+        rows = self.pitch_history.since(now - self.history_duration, max_points=2000)
+        self.history_renderer.set_data(x=rows['time'] - now, y=rows['freq'])
+
+    def export_history(self):
+        # https://doc.qt.io/qtforpython-6/PySide6/QtWidgets/QFileDialog.html#PySide6.QtWidgets.QFileDialog.getSaveFileName
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Exporter l'historique", "historique.csv", "CSV (*.csv);;Numpy (*.npy)")
+        if path:
+            try:
+                self.pitch_history.export(path)
+            except OSError as e:
+                self.show_error_message(f"Erreur lors de l'export de l'historique: {e}")
+
+    def get_playback(self):
+        # None s'il n'y a pas de sortie audio (machine sans carte son, PyAudio absent)
+        if self.playback is None:
+            try:
+                if self.audio is None:
+                    import pyaudio
+                    self.audio = pyaudio.PyAudio()
+                self.playback = PlaybackEngine(self.audio, rate=self.rate, chunk=self.chunk)
+            except (ImportError, IOError, ValueError):
+                return None
+        return self.playback
+
+    def generate_sound(self, mode):
+            if self.get_playback() is None:
+                self.show_error_message('Aucune sortie audio disponible.')
+            elif self.fundamental_freq[mode] != None:
+                # joué en arrière-plan par le callback du flux de sortie: l'interface et l'analyse continuent
+                self.playback.play_tone(self.fundamental_freq[mode])
+            else:
+                self.show_error_message('Aucune fréquence fondamentale détéctée.')
+
+    def generate_file_sound(self):
+        if self.get_playback() is None:
+            self.show_error_message('Aucune sortie audio disponible.')
+        elif self.file_path: # vérifie s'il y a bien un fichier audio ouvert
+            try:
+                self.playback.play_file(MappedWav(self.file_path))
+            except (OSError, ValueError, struct.error) as e:
+                self.show_error_message(f"Erreur lors de la lecture du fichier: {e}")
+        else:
+            self.show_error_message('Aucun fichier audio ouvert.')
+
+    def stop_sound(self):
+        if self.playback is not None:
+            self.playback.stop()
+
+    def on_tab_change(self, index):
+        current_tab = self.tab_widget.tabText(index)
+        if current_tab == "Acquisition" or current_tab == "Analyse":
+            self.capture.start()
+            self.timer.start()
+            self.pause_btn.show()
+        elif self.recorder is not None: # on continue d'enregistrer même si aucun tab live n'est affiché
+            self.pause_btn.hide()
+        else:
+            self.timer.stop()
+            self.capture.stop() # plus besoin de capturer quand aucun tab live n'est affiché
+            self.pause_btn.hide()
+
+    def createPlotWidget(self, x_label="", y_label="Amplitude (UA)"):
+        # https://pyqtgraph.readthedocs.io/en/latest/getting_started/plotting.html
+        # graphique
+        plot = pg.PlotWidget() # composant de PyQtGraph: permet d'afficher des graphiques 2D
+        plot.setYRange(-4000, 4000) # comme c'est codé sur 16 bits: 2^15 = 32 768. Les valeurs vont de -32 768 au min à 32 767 au max
+        plot.setLabel("bottom", x_label)
+        plot.setLabel("left", y_label)
+        return plot
+
+    def open_file_dialog(self):
+        # https://doc.qt.io/qtforpython-5/PySide2/QtWidgets/QFileDialog.html
+        file_dialog = QtWidgets.QFileDialog(self)
+        file_dialog.setNameFilter("Audio Files (*.wav)")
+        if file_dialog.exec():
+            self.process_file(file_dialog.selectedFiles()[0])
+            self.file_path = file_dialog.selectedFiles()[0]
+
+    def pause(self):
+        # le timer continue de tourner: sans consommateur actif, un tick ne lit même pas le tampon
+        self.pause_state = not self.pause_state
+        self.pause_btn.setText("Démarrer ▶️" if self.pause_state else "Pause ⏸️")
+
+    def update_min_freq(self, value):
+        if value <= self.max_freq:
+            self.min_freq = value
+            self.min_freq_line.setValue(value)
+            self.min_freq_label.setText(f"Fréquence minimale: {value} Hz")
+            self.update_estimator()
+        else:
+            self.show_error_message('La fréquence minimale doit être inférieure à la fréquence maximale.')
+            self.min_freq_slider.setValue(self.max_freq - 100)
+            self.min_freq = self.max_freq - 100
+            self.update_estimator()
+
+    def update_max_freq(self, value):
+        if value >= self.min_freq:
+            self.max_freq = value
+            self.max_freq_line.setValue(value)
+            self.max_freq_label.setText(f"Fréquence maximale: {value} Hz")
+            self.update_decimator()
+            self.update_estimator()
+        else:
+            self.show_error_message('La fréquence maximale doit être supérieure à la fréquence minimale.')
+            self.max_freq_slider.setValue(self.min_freq+100)
+            self.max_freq = self.min_freq+100
+            self.update_decimator()
+            self.update_estimator()
+
+    def reset_parameters(self):
+        self.min_freq = 250
+        self.min_freq_line.setValue(250)
+        self.min_freq_slider.setValue(250)
+        self.min_freq_label.setText("Fréquence minimale: 250 Hz")
+        
+        self.max_freq = 1100
+        self.max_freq_line.setValue(1100)
+        self.max_freq_slider.setValue(1100)
+        self.max_freq_label.setText("Fréquence maximale: 1100 Hz")
+        self.decimation_checkbox.setChecked(False)
+        self.update_decimator()
+        self.engine_combo.setCurrentIndex(0)
+        self.resolution_spinbox.setValue(1)
+        self.pitch_combo.setCurrentIndex(0)
+        self.update_estimator()
+        self.stft_checkbox.setChecked(False)
+        self.update_stft()
+        self.a4_spinbox.setValue(440)
+        self.note_names_combo.setCurrentIndex(0)
+
+    def update_note_table(self):
+        # la note du fichier est réaffichée tout de suite, celle du direct au prochain tick
+        self.note_table = get_note_table(self.a4_spinbox.value(), self.note_names_combo.currentData())
+        self.pitch_history.note_table = self.note_table # les nouvelles mesures de l'historique suivent le même La4
+        if self.fundamental_freq['file'] is not None:
+            self.update_fundamental_label('file')
+
+    def update_stft(self):
+        # nouvelle FFT glissante à chaque changement de paramètre (le tampon repart de zéro)
+        # un hop plus grand que la fenêtre laisserait des échantillons sans analyse: il est borné à la fenêtre
+        window = self.stft_window_combo.currentData()
+        self.stft_hop_spinbox.setMaximum(window)
+        if self.stft_checkbox.isChecked():
+            self.stft = SlidingStft(window, self.stft_hop_spinbox.value(), self.stft_function_combo.currentData(),
+                                    channels=self.channels, decimator=self.decimator)
+        else:
+            self.stft = None
+
+    def update_channels(self, channels):
+        # le flux d'entrée est rouvert avec le nouveau nombre de canaux; la FFT glissante et les moyennes repartent de zéro
+        try:
+            self.capture.set_channels(channels)
+        except (IOError, ValueError) as e:
+            self.show_error_message(f"Impossible de capturer {channels} canaux: {e}")
+            self.channels_spinbox.blockSignals(True)
+            self.channels_spinbox.setValue(self.channels)
+            self.channels_spinbox.blockSignals(False)
+            return
+        self.channels = channels
+        self.reset_channels('live', channels)
+        self.update_stft()
+
+    def toggle_perf_panel(self, shown):
+        self.perf_label.setVisible(shown)
+        if shown:
+            self.perf_label.setText(self.instrumentation.report())
+            self.perf_timer.start(500)
+        else:
+            self.perf_timer.stop()
+
+    def export_perf(self):
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Exporter les mesures", "performances.json", "JSON (*.json)")
+        if path:
+            try:
+                self.instrumentation.dump(path)
+            except OSError as e:
+                self.show_error_message(f"Erreur lors de l'export des mesures: {e}")
+
+    def toggle_profiler(self):
+        # le profileur relève la pile du thread de l'interface toutes les 5 ms, jusqu'au deuxième clic
+        if self.profiler is None:
+            self.profiler = SamplingProfiler()
+            self.profiler.start()
+            self.profiler_btn.setText("Arrêter le profileur")
+            return
+        profiler, self.profiler = self.profiler, None
+        profiler.stop()
+        self.profiler_btn.setText("Démarrer le profileur")
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Enregistrer le profil", "profil.txt", "Piles repliées (*.txt)")
+        if path:
+            try:
+                profiler.dump(path)
+            except OSError as e:
+                self.show_error_message(f"Erreur lors de l'enregistrement du profil: {e}")
+
+    def update_estimator(self):
+        # l'estimateur dépend de la bande [min_freq, max_freq]: on le recrée quand les sliders bougent
+        method = self.pitch_combo.currentData()
+        self.estimator = get_estimator(method, self.min_freq, self.max_freq) if method else None
+
+    def update_engine(self):
+        self.engine = self.engine_combo.currentData()
+        self.resolution = self.resolution_spinbox.value()
+        self.resolution_spinbox.setEnabled(self.engine == 'czt')
+
+    def update_decimator(self):
+        # le facteur de décimation dépend de max_freq: on le recalcule quand le slider bouge
+        if self.decimation_checkbox.isChecked():
+            # historique du filtre + un bloc: doit tenir dans le tampon circulaire, sinon latest() renvoie moins
+            # d'échantillons que demandé et l'analyse ne reçoit plus rien
+            self.decimator = Decimator(self.rate, self.max_freq, max_taps=self.capture.ring.capacity - self.chunk)
+        else:
+            self.decimator = None
+        if self.stft is not None:
+            self.update_stft() # la FFT glissante travaille au taux décimé: elle repart de zéro avec le nouveau facteur
+
+    def closeEvent(self, event):
+        # https://doc.qt.io/qtforpython-6/PySide6/QtWidgets/QWidget.html#PySide6.QtWidgets.QWidget.closeEvent
+        # on arrête proprement la capture avant de fermer la fenêtre
+        self.timer.stop()
+        if self.profiler is not None:
+            self.profiler.stop()
+        if self.recorder is not None:
+            self.recorder.close()
+        self.capture.close()
+        if self.playback is not None:
+            self.playback.close()
+        if self.audio is not None:
+            self.audio.terminate()
+        super().closeEvent(event)
+
+    def show_error_message(self, message):
+        if self.headless:
+            print(f"Erreur: {message}", file=sys.stderr)
+            return
+        msg = QMessageBox()
+        msg.setIcon(QMessageBox.Critical)
+        msg.setInformativeText(message)
+        msg.setWindowTitle("Erreur")
+        msg.exec()
@@ -0,0 +1,67 @@
+import numpy as np
+from analyse import get_note_table
+
+# historique de la fréquence fondamentale dans un tableau numpy de taille fixe (tampon circulaire):
+# ajouter une mesure est en O(1) et n'alloue rien, et des heures de suivi tiennent dans une mémoire bornée
+# (les mesures les plus anciennes sont écrasées une fois la capacité atteinte)
+
+# https://numpy.org/doc/stable/user/basics.rec.html
+HISTORY_DTYPE = np.dtype([('time', 'f8'), ('freq', 'f4'), ('confidence', 'f4'), ('note', 'i2')])
+
+class PitchHistory:
+    def __init__(self, capacity=100000, note_table=None):
+        self.data = np.zeros(capacity, dtype=HISTORY_DTYPE)
+        self.capacity = capacity
+        self.count = 0 # nombre total de mesures ajoutées (ne revient jamais à 0)
+        self.note_table = note_table or get_note_table() # La4 de référence pour la colonne note
+
+    def append(self, time, freq, confidence=np.nan):
+        row = self.data[self.count % self.capacity]
+        row['time'] = time
+        row['freq'] = freq
+        row['confidence'] = confidence
+        # numéro de la touche de piano la plus proche (La4 = 49), -1 si rien n'a été détecté (nan, 0)
+        row['note'] = self.note_table.key(freq) if freq > 0 else -1
+        self.count += 1
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def ordered(self):
+        # copie des mesures gardées, de la plus ancienne à la plus récente
+        if self.count <= self.capacity:
+            return self.data[:self.count].copy()
+        start = self.count % self.capacity
+        return np.concatenate([self.data[start:], self.data[:start]])
+
+    def since(self, start_time, max_points=None):
+        # mesures depuis start_time; avec max_points, on n'en garde qu'une sur step pour l'affichage
+        size = len(self)
+        if size == 0:
+            return self.data[:0]
+        end = self.count % self.capacity or size
+        # les instants sont croissants: on cherche où commence la fenêtre par dichotomie, dans chaque moitié du tampon
+        if self.count <= self.capacity or end == self.capacity:
+            rows = self.data[:size]
+            rows = rows[np.searchsorted(rows['time'], start_time):]
+        else:
+            older, newer = self.data[end:], self.data[:end]
+            if len(newer) > 0 and newer['time'][0] <= start_time:
+                rows = newer[np.searchsorted(newer['time'], start_time):]
+            else:
+                rows = np.concatenate([older[np.searchsorted(older['time'], start_time):], newer])
+        if max_points and len(rows) > max_points:
+            rows = rows[::len(rows) // max_points + 1]
+        return rows
+
+    def clear(self):
+        self.count = 0
+
+    def export(self, path):
+        # .npy: tableau numpy structuré; sinon CSV (time, freq, confidence, note)
+        rows = self.ordered()
+        if path.endswith('.npy'):
+            np.save(path, rows)
+        else:
+            np.savetxt(path, np.column_stack([rows['time'], rows['freq'], rows['confidence'], rows['note']]),
+                       delimiter=',', header='time,freq,confidence,note', comments='', fmt=['%.4f', '%.3f', '%.3f', '%d'])
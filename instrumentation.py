@@ -0,0 +1,159 @@
+import bisect, collections, json, sys, threading, time, numpy as np
+
+# mesures du chemin critique en direct: durée de chaque étape (lecture du tampon, décodage, FFT, pics, dessin...)
+# et compteurs, pour savoir où part le temps quand l'affichage saccade. enregistrer une durée ne coûte que deux
+# appels à perf_counter et quelques opérations (pas d'allocation): les mesures peuvent rester actives en permanence.
+
+# bornes (ms) de l'histogramme des durées: la dernière case compte tout ce qui dépasse 100 ms
+HISTOGRAM_EDGES = [0.1, 0.25, 0.5, 1, 2, 5, 10, 16.7, 33.3, 50, 100]
+
+class Stage:
+    # durées d'une étape: les 512 dernières (pour les percentiles) et un histogramme depuis le début
+    def __init__(self, name, size=512):
+        self.name = name
+        self.durations = np.zeros(size)
+        self.count = 0
+        self.total = 0.0
+        self.histogram = [0] * (len(HISTOGRAM_EDGES) + 1)
+        self.start = 0.0
+
+    def record(self, duration):
+        self.durations[self.count % len(self.durations)] = duration
+        self.count += 1
+        self.total += duration
+        self.histogram[bisect.bisect(HISTOGRAM_EDGES, duration * 1000)] += 1
+
+    # with instrumentation.stage('fft'): ... (réutilise le même objet: rien n'est créé à chaque mesure)
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.record(time.perf_counter() - self.start)
+
+    def summary(self):
+        recent = self.durations[:min(self.count, len(self.durations))] * 1000
+        if len(recent) == 0:
+            return {'count': 0}
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count * 1000,
+            'p50_ms': float(np.percentile(recent, 50)),
+            'p99_ms': float(np.percentile(recent, 99)),
+            'max_ms': float(recent.max()),
+            'histogram': dict(zip([f"<{edge}" for edge in HISTOGRAM_EDGES] + [f">={HISTOGRAM_EDGES[-1]}"], self.histogram)),
+        }
+
+class NullStage:
+    # étape désactivée: le with ne mesure rien
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def record(self, duration):
+        pass
+
+NULL_STAGE = NullStage()
+
+class Instrumentation:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.stages = {}
+        self.counters = {} # fonctions qui renvoient la valeur courante d'un compteur (débordements, blocs perdus...)
+        self.rates = {} # compteurs cumulés dont on affiche le débit par seconde (échantillons décodés...)
+        self.last_rates = {}
+
+    def stage(self, name):
+        if not self.enabled:
+            return NULL_STAGE
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = Stage(name)
+        return stage
+
+    def counter(self, name, read):
+        self.counters[name] = read
+
+    def rate(self, name, read):
+        self.rates[name] = read
+
+    def summary(self):
+        now = time.monotonic()
+        rates = {}
+        for name, read in self.rates.items():
+            value = read()
+            last_time, last_value = self.last_rates.get(name, (now, value))
+            rates[name] = (value - last_value) / (now - last_time) if now > last_time else 0.0
+            self.last_rates[name] = (now, value)
+        return {
+            'stages': {name: stage.summary() for name, stage in self.stages.items()},
+            'counters': {name: read() for name, read in self.counters.items()},
+            'rates': rates,
+        }
+
+    def report(self):
+        # texte court pour le panneau de l'interface: une ligne par étape, puis les compteurs
+        summary = self.summary()
+        lines = [f"{'étape':22s} {'moy.':>7s} {'p50':>7s} {'p99':>7s} {'max':>7s} (ms)"]
+        for name, stage in summary['stages'].items():
+            if stage['count']:
+                lines.append(f"{name:22s} {stage['mean_ms']:7.3f} {stage['p50_ms']:7.3f} {stage['p99_ms']:7.3f} {stage['max_ms']:7.2f}")
+        lines += [f"{name}: {value:.3g}" if isinstance(value, float) else f"{name}: {value}" for name, value in summary['counters'].items()]
+        lines += [f"{name}: {value:,.0f}/s".replace(",", " ") for name, value in summary['rates'].items()]
+        return "\n".join(lines)
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+
+class SamplingProfiler:
+    # profileur par échantillonnage: un thread relève toutes les 'interval' s la pile d'appels du thread observé
+    # (https://docs.python.org/3/library/sys.html#sys._current_frames). le thread profilé n'est jamais ralenti
+    # par une trace à chaque appel (contrairement à cProfile), le coût ne dépend que de la fréquence des relevés.
+    # export au format "piles repliées" (une pile par ligne, suivie du nombre de relevés), lisible par flamegraph.pl
+    # ou speedscope
+    def __init__(self, thread_id=None, interval=0.005):
+        self.thread_id = thread_id or threading.main_thread().ident
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="SamplingProfiler", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while self.running:
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+            time.sleep(self.interval)
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def top(self, count=15):
+        # fonctions où le thread a été vu le plus souvent (en haut de la pile: temps propre)
+        own = collections.Counter()
+        for stack, hits in self.stacks.items():
+            own[stack.rsplit(";", 1)[-1]] += hits
+        return [(name, hits / max(self.samples, 1)) for name, hits in own.most_common(count)]
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            for stack, hits in self.stacks.most_common():
+                f.write(f"{stack} {hits}\n")
@@ -0,0 +1,203 @@
+import numpy as np
+from analyse import get_plan, find_peak
+
+# estimateurs de la fréquence fondamentale sur une seule fenêtre (pas besoin de moyenner plusieurs ticks).
+# chaque estimateur a la même interface: estimate(data, rate) -> (fréquences, confiances),
+# data est une fenêtre (1D) ou un lot de fenêtres (2D, une par ligne); la fréquence vaut nan si rien n'est détecté
+
+def parabolic_offset(left, center, right):
+    # décalage (entre -0.5 et 0.5) du sommet de la parabole passant par trois points voisins
+    with np.errstate(divide='ignore', invalid='ignore'):
+        denom = left - 2 * center + right
+        offset = np.where(denom != 0, 0.5 * (left - right) / denom, 0.0)
+    return np.clip(np.nan_to_num(offset), -0.5, 0.5)
+
+def pick(values, index):
+    # values[..., index] pour un index par fenêtre (index borné aux extrémités)
+    index = np.clip(index, 0, values.shape[-1] - 1)
+    return np.take_along_axis(values, index[..., None], axis=-1)[..., 0]
+
+class PitchEstimator:
+    name = ''
+
+    def __init__(self, min_freq, max_freq):
+        self.min_freq = max(min_freq, 20) # en dessous de 20 Hz, la période ne tient plus dans une fenêtre
+        self.max_freq = max(max_freq, self.min_freq) # max_freq à 0 (sliders): pas de division par zéro dans lag_range
+
+    def lag_range(self, length, rate):
+        # périodes (en échantillons) correspondant à la bande [min_freq, max_freq]
+        # (bornées à la demi-fenêtre: une période plus longue que la fenêtre ne peut pas être mesurée)
+        min_lag = min(max(2, int(rate / self.max_freq)), length // 2 - 2)
+        max_lag = min(length // 2, int(np.ceil(rate / self.min_freq)) + 1)
+        return min_lag, max(min_lag + 2, max_lag)
+
+    def in_band(self, freqs):
+        # l'interpolation (ou un pic au bord de la recherche) peut donner une fréquence hors de [min_freq, max_freq]:
+        # elle n'est alors pas fiable, on la remplace par nan
+        freqs = np.asarray(freqs, dtype=np.float64)
+        with np.errstate(invalid='ignore'):
+            return np.where((freqs >= self.min_freq) & (freqs <= self.max_freq), freqs, np.nan)
+
+    def estimate(self, data, rate):
+        raise NotImplementedError
+
+class FftPeakEstimator(PitchEstimator):
+    # pic le plus fort du spectre au-dessus de 3 fois le bruit moyen, avec interpolation entre les bins
+    name = 'fft'
+
+    def estimate(self, data, rate):
+        data = np.asarray(data, dtype=np.float64)
+        plan = get_plan(data.shape[-1], rate, self.min_freq, self.max_freq, 'hann')
+        spectra = plan.spectrum(data)
+        freqs, amps = find_peak(plan, spectra)
+        band = spectra[..., plan.band]
+        if band.shape[-1] == 0:
+            return freqs, np.zeros_like(amps)
+        confidence = amps / (band.sum(axis=-1) + 1e-12)
+        # un maximum sur le premier ou le dernier bin de la bande, plus bas que son voisin hors de la bande,
+        # n'est que le flanc d'un pic situé en dehors: pas de fréquence dans ce cas
+        index = plan.band.start + np.argmax(band, axis=-1)
+        interior = (amps >= pick(spectra, index - 1)) & (amps >= pick(spectra, index + 1))
+        return self.in_band(np.where(interior, freqs, np.nan)), confidence
+
+class YinEstimator(PitchEstimator):
+    # http://audition.ens.fr/adc/pdf/2002_JASA_YIN.pdf
+    # YIN: fonction de différence d(τ) = somme des (x[j] - x[j + τ])², normalisée par sa moyenne cumulée;
+    # la période est le premier creux sous le seuil. contrairement au pic de la FFT, ne se trompe pas d'harmonique.
+    name = 'yin'
+
+    def __init__(self, min_freq, max_freq, threshold=0.15):
+        super().__init__(min_freq, max_freq)
+        self.threshold = threshold
+
+    def estimate(self, data, rate):
+        data = np.asarray(data, dtype=np.float64)
+        data = data - data.mean(axis=-1, keepdims=True)
+        length = data.shape[-1]
+        min_lag, max_lag = self.lag_range(length, rate)
+        width = length - max_lag # nombre de termes de chaque somme
+
+        # d(τ) = énergie(x[0:width]) + énergie(x[τ:τ + width]) - 2 * corrélation(τ), la corrélation par FFT
+        size = 1 << (length + width - 1).bit_length()
+        correlation = np.fft.irfft(np.fft.rfft(data, size, axis=-1) * np.conj(np.fft.rfft(data[..., :width], size, axis=-1)),
+                                   size, axis=-1)[..., :max_lag + 1]
+        energy = np.cumsum(np.concatenate([np.zeros(data.shape[:-1] + (1,)), data ** 2], axis=-1), axis=-1)
+        lags = np.arange(max_lag + 1)
+        diff = energy[..., width:width + 1] + energy[..., lags + width] - energy[..., lags] - 2 * correlation
+
+        # moyenne cumulée normalisée: d'(0) = 1, d'(τ) = d(τ) * τ / somme(d(1..τ))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cmnd = diff[..., 1:] * lags[1:] / np.cumsum(diff[..., 1:], axis=-1)
+        cmnd = np.concatenate([np.ones(data.shape[:-1] + (1,)), np.nan_to_num(cmnd, nan=1.0)], axis=-1)
+        search = np.where(lags >= min_lag, cmnd, np.inf)
+
+        # premier passage sous le seuil, puis minimum du creux qui suit (jusqu'à ce qu'on repasse au-dessus)
+        below = search < self.threshold
+        found = below.any(axis=-1)
+        first = np.argmax(below, axis=-1)
+        after = lags >= first[..., None]
+        end = np.where((after & ~below).any(axis=-1), np.argmax(after & ~below, axis=-1), max_lag + 1)
+        dip = np.where(after & (lags < end[..., None]), search, np.inf)
+        lag = np.where(found, np.argmin(dip, axis=-1), np.argmin(search, axis=-1)) # sinon: minimum global
+
+        period = lag + parabolic_offset(pick(cmnd, lag - 1), pick(cmnd, lag), pick(cmnd, lag + 1))
+        confidence = np.clip(1 - pick(cmnd, lag), 0, 1)
+        freqs = np.where(found, rate / period, np.nan)
+        return self.in_band(freqs), confidence
+
+class AutocorrelationEstimator(PitchEstimator):
+    # autocorrélation normalisée (calculée par FFT): la période est le plus haut pic entre min_lag et max_lag
+    name = 'acf'
+
+    def __init__(self, min_freq, max_freq, threshold=0.5):
+        super().__init__(min_freq, max_freq)
+        self.threshold = threshold
+
+    def estimate(self, data, rate):
+        data = np.asarray(data, dtype=np.float64)
+        data = data - data.mean(axis=-1, keepdims=True)
+        length = data.shape[-1]
+        min_lag, max_lag = self.lag_range(length, rate)
+
+        # https://en.wikipedia.org/wiki/Autocorrelation#Efficient_computation (Wiener-Khintchine)
+        size = 1 << (2 * length - 1).bit_length() # zéros ajoutés: corrélation linéaire et pas circulaire
+        spectrum = np.fft.rfft(data, size, axis=-1)
+        acf = np.fft.irfft(spectrum * np.conj(spectrum), size, axis=-1)[..., :max_lag + 1]
+        # on compense le nombre de termes qui diminue avec τ, puis on normalise par r(0)
+        acf = acf / (length - np.arange(max_lag + 1)) * length
+        acf = acf / (acf[..., :1] + 1e-12)
+
+        # seuls les pics intérieurs comptent (acf[τ] >= ses deux voisins, min_lag < τ < max_lag): au bord de la
+        # recherche, l'autocorrélation peut simplement décroître et l'interpolation sortirait de la bande.
+        # les multiples de la période (2τ, 3τ...) donnent des pics presque aussi hauts: on prend le premier pic
+        # qui atteint 90 % du maximum, ce qui évite de tomber une octave trop bas
+        lags = np.arange(max_lag + 1)
+        peak = np.zeros(acf.shape, dtype=bool)
+        peak[..., 1:-1] = (acf[..., 1:-1] >= acf[..., :-2]) & (acf[..., 1:-1] >= acf[..., 2:])
+        search = np.where(peak & (lags > min_lag) & (lags < max_lag), acf, -np.inf)
+        best = search.max(axis=-1, keepdims=True)
+        found = np.isfinite(best[..., 0])
+        lag = np.argmax(search >= 0.9 * best, axis=-1)
+        period = lag + parabolic_offset(pick(acf, lag - 1), pick(acf, lag), pick(acf, lag + 1))
+        confidence = np.where(found, np.clip(pick(acf, lag), 0, 1), 0.0)
+        freqs = np.where(found & (confidence >= self.threshold), rate / period, np.nan)
+        return self.in_band(freqs), confidence
+
+class HpsEstimator(PitchEstimator):
+    # https://cnx.org/contents/i5AAkZCP@2/Pitch-Detection-Algorithms (produit spectral harmonique)
+    # on multiplie le spectre par ses versions compressées d'un facteur 2, 3...: seules les fréquences dont les
+    # harmoniques sont aussi présentes ressortent, ce qui évite de prendre un harmonique pour la fondamentale
+    name = 'hps'
+
+    def __init__(self, min_freq, max_freq, harmonics=4, padding=4):
+        super().__init__(min_freq, max_freq)
+        self.harmonics = harmonics
+        self.padding = padding # zéros ajoutés: pas entre les bins divisé par padding
+
+    def estimate(self, data, rate):
+        data = np.asarray(data, dtype=np.float64)
+        length = data.shape[-1]
+        size = length * self.padding
+        spectrum = np.abs(np.fft.rfft(data * np.hanning(length), size, axis=-1))
+        bin_width = rate / size
+
+        # log du produit = somme des logs: évite les dépassements avec des amplitudes élevées.
+        # plancher à -40 dB du maximum: un harmonique absent (son pur) pénalise sans annuler le produit,
+        # et la fondamentale compte double pour ne pas choisir la sous-octave (dont le 2e harmonique est le vrai pic)
+        # seuls les harmoniques de max_freq qui restent sous la fréquence de Nyquist sont utilisés: sur un signal
+        # décimé (taux à ~2,5 * max_freq), il n'en reste qu'un et la recherche couvre quand même toute la bande
+        bins = spectrum.shape[-1]
+        harmonics = max(1, min(self.harmonics, (bins - 1) // (int(self.max_freq / bin_width) + 1)))
+        count = bins // harmonics
+        log_spectrum = np.log(spectrum + 1e-2 * spectrum.max(axis=-1, keepdims=True) + 1e-12)
+        hps = 2 * log_spectrum[..., :count]
+        for h in range(2, harmonics + 1):
+            hps += log_spectrum[..., ::h][..., :count]
+
+        start = max(1, int(self.min_freq / bin_width))
+        stop = min(count, int(self.max_freq / bin_width) + 1)
+        if stop <= start:
+            nan = np.full(data.shape[:-1], np.nan)
+            return nan, np.zeros(data.shape[:-1])
+        index = start + np.argmax(hps[..., start:stop], axis=-1)
+
+        # le produit choisit la bonne octave, mais le bruit aux harmoniques déplace son maximum dans le lobe:
+        # on affine sur le pic du spectre lui-même, autour de l'index trouvé (sans sortir de la bande de recherche)
+        around = np.clip(index[..., None] + np.arange(-2 * self.padding, 2 * self.padding + 1), start, stop - 1)
+        index = np.take_along_axis(around, np.argmax(np.take_along_axis(log_spectrum, around, axis=-1), axis=-1)[..., None], axis=-1)[..., 0]
+        offset = parabolic_offset(pick(log_spectrum, index - 1), pick(log_spectrum, index), pick(log_spectrum, index + 1))
+
+        # confiance: part de l'énergie du spectre autour de la fondamentale et de ses harmoniques
+        # (± 2 * padding bins: largeur du lobe principal de la fenêtre de Hann)
+        power = np.cumsum(spectrum ** 2, axis=-1)
+        harmonic_bins = index[..., None] * np.arange(1, harmonics + 1)
+        upper = np.take_along_axis(power, np.clip(harmonic_bins + 2 * self.padding, 0, power.shape[-1] - 1), axis=-1)
+        lower = np.take_along_axis(power, np.clip(harmonic_bins - 2 * self.padding, 0, power.shape[-1] - 1), axis=-1)
+        confidence = np.clip((upper - lower).sum(axis=-1) / (power[..., -1] + 1e-12), 0, 1)
+        freqs = np.where(confidence > 0.3, (index + offset) * bin_width, np.nan)
+        return self.in_band(freqs), confidence
+
+ESTIMATORS = {estimator.name: estimator for estimator in (FftPeakEstimator, YinEstimator, AutocorrelationEstimator, HpsEstimator)}
+
+def get_estimator(name, min_freq, max_freq):
+    return ESTIMATORS[name](min_freq, max_freq)
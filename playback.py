@@ -0,0 +1,123 @@
+import numpy as np
+from functools import lru_cache
+from decode import FULL_SCALE
+
+# lecture du son en arrière-plan: un seul flux de sortie, ouvert une fois, alimenté par un callback PortAudio.
+# le thread de l'interface ne fait que choisir ce qui doit être joué (une source): il ne bloque plus pendant la
+# lecture, donc l'analyse en direct continue et la lecture peut être arrêtée à tout moment.
+
+@lru_cache(maxsize=32)
+def tone_buffer(freq, rate, duration=1.0, amplitude=0.5):
+    # sinusoïde synthétisée une seule fois par fréquence: rejouer la même note ne recalcule rien.
+    # fondu de 5 ms au début et à la fin pour éviter le clic dû au saut d'amplitude
+    t = np.arange(int(rate * duration)) / rate
+    samples = (amplitude * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+    fade = min(len(samples) // 2, int(rate * 0.005))
+    ramp = np.linspace(0, 1, fade, dtype=np.float32)
+    samples[:fade] *= ramp
+    samples[len(samples) - fade:] *= ramp[::-1]
+    samples.flags.writeable = False # partagé par le cache: personne ne doit le modifier
+    return samples
+
+class BufferSource:
+    # son déjà en mémoire (1D, mono): joué sur tous les canaux du flux
+    def __init__(self, samples):
+        self.samples = samples
+        self.pos = 0
+
+    def fill(self, out):
+        # remplit out (frames, channels) et renvoie True quand la source est terminée
+        n = min(len(out), len(self.samples) - self.pos)
+        out[:n] = self.samples[self.pos:self.pos + n, None]
+        self.pos += n
+        return self.pos >= len(self.samples)
+
+class WavSource:
+    # fichier projeté en mémoire (MappedWav): seuls les blocs demandés par le callback sont lus et décodés
+    def __init__(self, wav):
+        self.wav = wav
+        self.scale = np.float32(1 / FULL_SCALE[wav.sampwidth])
+        self.pos = 0
+
+    def fill(self, out):
+        frames = self.wav.read(self.pos, len(out))
+        out[:len(frames)] = frames * self.scale
+        self.pos += len(frames)
+        return self.pos >= self.wav.num_frames
+
+class PlaybackEngine:
+    # https://people.csail.mit.edu/hubert/pyaudio/docs/#example-callback-mode-audio-i-o
+    def __init__(self, audio, rate=44100, channels=1, chunk=1024):
+        import pyaudio # importé ici: seule la lecture du son a besoin de PyAudio
+        self.pyaudio = pyaudio
+        self.audio = audio
+        self.chunk = chunk
+        self.stream = None
+        self.rate = None
+        self.channels = None
+        self.source = None # ce qui est en train d'être joué (remplacé d'un bloc: pas besoin de verrou)
+        self.underflows = 0 # blocs que PortAudio n'a pas reçus à temps
+        self.open(rate, channels)
+
+    def open(self, rate, channels):
+        # le flux n'est rouvert que si le format change (fichier à une autre fréquence ou un autre nombre de canaux)
+        if self.stream is not None and (rate, channels) == (self.rate, self.channels):
+            return
+        self.stop()
+        # nouveau flux ouvert avant de fermer l'ancien: si le périphérique refuse ce format (IOError, ValueError),
+        # l'erreur remonte et l'ancien flux reste utilisable pour les sons suivants
+        stream = self.audio.open(
+            format = self.pyaudio.paFloat32,
+            channels = channels,
+            rate = rate,
+            frames_per_buffer = self.chunk,
+            output = True,
+            stream_callback = self.callback,
+            start = False
+        )
+        self.close()
+        self.stream = stream
+        self.rate = rate
+        self.channels = channels
+
+    def callback(self, in_data, frame_count, time_info, status):
+        if status & self.pyaudio.paOutputUnderflow:
+            self.underflows += 1
+        source = self.source
+        out = np.zeros((frame_count, self.channels), dtype=np.float32) # silence après la fin de la source
+        if source is not None and not source.fill(out):
+            return (out.tobytes(), self.pyaudio.paContinue)
+        if self.source is source: # une autre source a pu être lancée entre-temps: on ne l'efface pas
+            self.source = None
+            return (out.tobytes(), self.pyaudio.paComplete)
+        return (out.tobytes(), self.pyaudio.paContinue)
+
+    def play(self, source):
+        self.source = source
+        if not self.stream.is_active():
+            # après paComplete, le flux doit être arrêté avant de pouvoir redémarrer
+            self.stream.stop_stream()
+            self.stream.start_stream()
+
+    def play_tone(self, freq, duration=1.0):
+        # fréquence arrondie au centième de Hz: la clé du cache ne change pas pour un bruit de mesure
+        self.play(BufferSource(tone_buffer(round(float(freq), 2), self.rate, duration)))
+
+    def play_file(self, wav):
+        self.open(wav.rate, wav.channels)
+        self.play(WavSource(wav))
+
+    @property
+    def playing(self):
+        return self.source is not None
+
+    def stop(self):
+        self.source = None
+        if self.stream is not None:
+            self.stream.stop_stream()
+
+    def close(self):
+        if self.stream is not None:
+            self.stop()
+            self.stream.close()
+            self.stream = None
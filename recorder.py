@@ -0,0 +1,114 @@
+import queue, struct, threading, time, numpy as np
+
+# enregistrement de la capture en direct dans un fichier WAV.
+# le timer de l'interface ne fait que déposer les blocs dans une file de taille bornée (sans jamais attendre);
+# un thread d'écriture les vide par paquets et met à jour l'en-tête régulièrement: si l'application plante,
+# le fichier reste lisible jusqu'à la dernière mise à jour. si le disque est trop lent et que la file est pleine,
+# les nouveaux blocs sont comptés comme perdus plutôt que de bloquer la capture ou l'affichage.
+
+HEADER_SIZE = 44
+# les tailles de l'en-tête sont sur 32 bits: au plus ~4 Gio d'échantillons (6,7 h en mono, 3,4 h en stéréo à 44,1 kHz)
+MAX_DATA_SIZE = 2**32 - 1 - (HEADER_SIZE - 8)
+
+def wav_header(rate, channels, sampwidth, data_size):
+    # https://docs.fileformat.com/audio/wav/
+    return struct.pack('<4sI4s4sIHHIIHH4sI', b'RIFF', HEADER_SIZE - 8 + data_size, b'WAVE', b'fmt ', 16, 1, channels, rate,
+                       rate * channels * sampwidth, channels * sampwidth, 8 * sampwidth, b'data', data_size)
+
+class WavRecorder:
+    def __init__(self, path, rate, channels=1, sampwidth=2, queue_size=64, batch=16, header_interval=1.0):
+        self.path = path
+        self.rate = rate
+        self.channels = channels
+        self.sampwidth = sampwidth
+        self.batch = batch # nombre maximal de blocs écrits en une fois
+        self.header_interval = header_interval # secondes entre deux mises à jour de l'en-tête
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped_chunks = 0 # blocs perdus parce que la file était pleine
+        self.data_size = 0 # octets d'échantillons écrits
+        self.error = None # erreur d'écriture (disque plein...), l'enregistrement s'arrête
+
+        self.file = open(path, 'wb')
+        self.file.write(wav_header(rate, channels, sampwidth, 0))
+        # https://docs.python.org/3/library/threading.html#threading.Thread (daemon: ne bloque pas la fermeture)
+        self.thread = threading.Thread(target=self.run, name="WavRecorder", daemon=True)
+        self.thread.start()
+
+    def write(self, samples):
+        # samples: (channels, n) entiers 16 bits, comme les consommateurs de CaptureEngine
+        if self.error is not None:
+            self.dropped_chunks += 1
+            return
+        try:
+            self.queue.put_nowait(np.ascontiguousarray(np.asarray(samples).T).tobytes()) # entrelacé: [g0, d0, g1, d1...]
+        except queue.Full:
+            self.dropped_chunks += 1
+
+    @property
+    def queue_depth(self):
+        return self.queue.qsize()
+
+    @property
+    def duration(self):
+        return self.data_size / (self.rate * self.channels * self.sampwidth)
+
+    def run(self):
+        last_header = time.monotonic()
+        header_size = 0 # data_size inscrite dans l'en-tête
+        running = True
+        while running:
+            try:
+                chunks = [self.queue.get(timeout=self.header_interval)]
+            except queue.Empty:
+                # plus de blocs (capture en pause, source arrêtée): l'en-tête est quand même mis à jour,
+                # sinon un plantage à ce moment laisserait un fichier qui se lit comme vide
+                if self.data_size != header_size:
+                    try:
+                        self.write_header()
+                    except OSError as e:
+                        self.error = e
+                        break
+                    header_size, last_header = self.data_size, time.monotonic()
+                continue
+            # on récupère ce qui attend déjà dans la file: une seule écriture pour plusieurs blocs
+            while len(chunks) < self.batch:
+                try:
+                    chunks.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in chunks: # demande d'arrêt: on écrit ce qui précède puis on termine
+                chunks = chunks[:chunks.index(None)]
+                running = False
+
+            data = b''.join(chunks)
+            room = MAX_DATA_SIZE - self.data_size
+            room -= room % (self.channels * self.sampwidth) # on ne coupe pas au milieu d'une trame
+            if len(data) > room: # fichier plein: on écrit ce qui tient et l'enregistrement s'arrête proprement
+                data = data[:room]
+                self.error = ValueError("taille maximale d'un fichier WAV (4 Gio) atteinte")
+                running = False
+
+            try:
+                self.file.write(data)
+                self.data_size += len(data)
+                if not running or time.monotonic() - last_header >= self.header_interval:
+                    self.write_header()
+                    header_size, last_header = self.data_size, time.monotonic()
+            except OSError as e:
+                self.error = e
+                break
+        self.file.close()
+
+    def write_header(self):
+        # tailles RIFF et data mises à jour, puis retour à la fin du fichier pour la suite
+        self.file.seek(0)
+        self.file.write(wav_header(self.rate, self.channels, self.sampwidth, self.data_size))
+        self.file.seek(0, 2)
+        self.file.flush()
+
+    def close(self):
+        # attend que tous les blocs déjà dans la file soient écrits
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
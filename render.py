@@ -0,0 +1,85 @@
+import time, numpy as np
+from instrumentation import NULL_STAGE
+
+# couche d'affichage entre les données et les courbes pyqtgraph:
+# - chaque courbe est réduite à quelques points par pixel (enveloppe min/max: les pics restent visibles)
+# - on ne dessine qu'au timer de rendu de l'interface (cadencé sur le rafraîchissement de l'écran), et seulement
+#   si de nouvelles données sont arrivées depuis le dessin précédent
+# - autoRange n'est appelé que si les bornes des données ont vraiment changé
+# - si un dessin dépasse le budget de temps par image, on diminue le nombre de points par pixel
+
+def minmax_decimate(x, y, buckets):
+    # découpe les données en 'buckets' paquets et garde, pour chacun, le minimum et le maximum (dans leur ordre)
+    n = len(y)
+    if n <= 2 * buckets:
+        return x, y
+    size = -(-n // buckets) # taille d'un paquet (arrondie au-dessus: le dernier paquet est plus petit)
+    padded = size * buckets
+    # les nan (fréquence non détectée) ne doivent être choisis ni comme minimum ni comme maximum
+    low = np.pad(np.where(np.isnan(y), np.inf, y), (0, padded - n), constant_values=np.inf).reshape(buckets, size)
+    high = np.pad(np.where(np.isnan(y), -np.inf, y), (0, padded - n), constant_values=-np.inf).reshape(buckets, size)
+    base = np.arange(buckets) * size
+    imin, imax = base + low.argmin(axis=1), base + high.argmax(axis=1)
+    index = np.stack([np.minimum(imin, imax), np.maximum(imin, imax)], axis=1).ravel()
+    index = np.minimum(index, n - 1)
+    return x[index], y[index]
+
+class CurveRenderer:
+    # stage: étape de instrumentation.py où la durée de chaque dessin est enregistrée
+    def __init__(self, curve, points_per_pixel=2, budget=0.008, auto_range=False, stage=NULL_STAGE):
+        self.curve = curve
+        self.max_points_per_pixel = points_per_pixel
+        self.points_per_pixel = points_per_pixel
+        self.budget = budget # temps maximal (s) d'un dessin
+        self.auto_range = auto_range
+        self.pending = None
+        self.bounds = None
+        self.draw_time = 0 # durée du dernier dessin (s)
+        self.stage = stage
+
+    def set_data(self, x=None, y=None, **kwargs):
+        # on garde seulement les dernières données: elles seront dessinées au prochain flush
+        self.pending = (x, y, kwargs)
+
+    def flush(self):
+        # appelé par le timer de rendu, qui fixe la cadence: on dessine dès que de nouvelles données attendent
+        if self.pending is None:
+            return
+        now = time.perf_counter()
+        x, y, kwargs = self.pending
+        self.pending = None
+        self.draw(x, y, kwargs)
+        self.draw_time = time.perf_counter() - now
+        self.stage.record(self.draw_time)
+
+        # ajustement au budget: moins de points si le dessin est trop long, plus s'il reste beaucoup de marge
+        if self.draw_time > self.budget and self.points_per_pixel > 0.25:
+            self.points_per_pixel /= 2
+        elif self.draw_time < self.budget / 4 and self.points_per_pixel < self.max_points_per_pixel:
+            self.points_per_pixel = min(self.max_points_per_pixel, self.points_per_pixel * 2)
+
+    def draw(self, x, y, kwargs):
+        y = np.asarray(y)
+        x = np.arange(len(y)) if x is None else np.asarray(x)
+        view_box = self.curve.getViewBox()
+        width = int(view_box.width()) if view_box is not None and view_box.width() > 0 else 1000 # largeur en pixels
+        x, y = minmax_decimate(x, y, max(16, int(width * self.points_per_pixel / 2)))
+        self.curve.setData(x=x, y=y, **kwargs)
+
+        if self.auto_range and len(y) > 0 and view_box is not None:
+            finite = y[np.isfinite(y)]
+            if len(finite) == 0:
+                return
+            bounds = (x[0], x[-1], finite.min(), finite.max())
+            if self.bounds_changed(bounds):
+                self.bounds = bounds
+                view_box.autoRange()
+
+    def bounds_changed(self, bounds, tolerance=0.1):
+        # changement de plus de 10 % de l'étendue: évite de recadrer à chaque tick pour une variation de bruit
+        if self.bounds is None:
+            return True
+        x_span = max(self.bounds[1] - self.bounds[0], 1e-12)
+        y_span = max(self.bounds[3] - self.bounds[2], 1e-12)
+        spans = (x_span, x_span, y_span, y_span)
+        return any(abs(new - old) > tolerance * span for new, old, span in zip(bounds, self.bounds, spans))
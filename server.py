@@ -0,0 +1,429 @@
+import argparse, collections, json, os, selectors, socket, struct, sys, threading, time, numpy as np
+from capture import CaptureEngine
+from sources import SourceBackend, parse_source
+from analyse import get_plan, find_peak, get_note_table
+from pitch import ESTIMATORS, get_estimator
+
+# serveur local: la capture et l'analyse en direct tournent sans interface et les résultats (fondamentale,
+# note, écart en cents, confiance, spectre réduit en option) sont publiés sur une socket TCP ou Unix.
+# une seule analyse par tick, encodée une seule fois: les mêmes octets sont envoyés à tous les clients.
+#
+# python server.py --source tone:440 --tcp 127.0.0.1:5555     (micro si pas de --source)
+# python server.py --client 127.0.0.1:5555                    affiche ce que publie le serveur
+#
+# chaque client a sa propre file de messages, de taille bornée: un client trop lent perd les messages les plus
+# anciens (il en est averti par un message DROPPED) au lieu de ralentir l'analyse, la capture ou les autres clients.
+# les envois se font dans un thread à part, sur des sockets non bloquantes (https://docs.python.org/3/library/selectors.html)
+#
+# format: une suite de messages [taille du contenu (uint32), type (uint8), contenu], little-endian
+#   HELLO   (1): JSON, envoyé à la connexion: rate, channels, window, hop, note_names, spectrum_freqs...
+#   RESULTS (2): en-tête (premier tick uint64, nombre de ticks uint16, canaux uint16, bins du spectre uint16)
+#                puis, pour les n ticks: instants float64[n], fréquences float32[n, canaux], confiances float32[n, canaux],
+#                notes int8[n, canaux] (0 = Do, -1: rien), octaves int8[n, canaux], cents float32[n, canaux],
+#                spectre float32[n, canaux, bins]
+#   DROPPED (3): nombre total (uint64) de messages perdus par ce client depuis sa connexion
+
+FRAME_HEADER = struct.Struct('<IB')
+RESULTS_HEADER = struct.Struct('<QHHH')
+DROPPED = struct.Struct('<Q')
+FRAME_HELLO, FRAME_RESULTS, FRAME_DROPPED = 1, 2, 3
+PROTOCOL_VERSION = 1
+
+def encode_frame(kind, payload):
+    return FRAME_HEADER.pack(len(payload), kind) + payload
+
+def decode_results(payload):
+    seq, count, channels, bins = RESULTS_HEADER.unpack_from(payload)
+    result = {'seq': seq}
+    offset = RESULTS_HEADER.size
+    for name, dtype, shape in (('times', '<f8', (count,)), ('freqs', '<f4', (count, channels)), ('confidences', '<f4', (count, channels)),
+                               ('notes', 'i1', (count, channels)), ('octaves', 'i1', (count, channels)), ('cents', '<f4', (count, channels)),
+                               ('spectrum', '<f4', (count, channels, bins))):
+        size = int(np.prod(shape))
+        result[name] = np.frombuffer(payload, dtype=dtype, count=size, offset=offset).reshape(shape)
+        offset += size * np.dtype(dtype).itemsize
+    return result
+
+def parse_address(text):
+    # 'hôte:port' (TCP) ou chemin de la socket Unix
+    host, _, port = text.rpartition(':')
+    if port.isdigit():
+        return socket.AF_INET, (host or '127.0.0.1', int(port))
+    return socket.AF_UNIX, text
+
+def read_frames(sock):
+    # messages (type, contenu) reçus du serveur, jusqu'à la fermeture de la connexion
+    buffer = bytearray()
+    while True:
+        data = sock.recv(1 << 16)
+        if not data:
+            return
+        buffer += data
+        while len(buffer) >= FRAME_HEADER.size:
+            size, kind = FRAME_HEADER.unpack_from(buffer)
+            if len(buffer) < FRAME_HEADER.size + size:
+                break
+            yield kind, bytes(buffer[FRAME_HEADER.size:FRAME_HEADER.size + size])
+            del buffer[:FRAME_HEADER.size + size]
+
+class LiveAnalyser:
+    # consommateur de CaptureEngine: analyse la dernière fenêtre à chaque tick et regroupe les résultats
+    # de 'batch' ticks dans un message RESULTS (moins d'envois, moins d'en-têtes)
+    def __init__(self, capture, publish, window=4096, min_freq=250, max_freq=1100, estimator=None, spectrum_bins=0,
+                 batch=4, a4=440.0, note_names='fr'):
+        self.capture = capture
+        self.publish = publish # fonction qui reçoit chaque message encodé
+        self.window = window
+        self.min_freq = min_freq
+        self.max_freq = max_freq
+        self.estimator = get_estimator(estimator, min_freq, max_freq) if estimator else None # None: pic de la FFT
+        self.note_table = get_note_table(a4, note_names)
+        self.plan = get_plan(window, capture.rate, min_freq, max_freq, 'hann')
+
+        # spectre réduit: la bande [min_freq, max_freq] découpée en spectrum_bins groupes de bins, dont on garde
+        # le maximum (un pic étroit reste visible)
+        band = self.plan.freqs[self.plan.band]
+        self.spectrum_bins = min(spectrum_bins, len(band))
+        self.spectrum_edges = np.linspace(0, len(band), self.spectrum_bins + 1).astype(int)[:-1]
+        self.spectrum_freqs = np.add.reduceat(band, self.spectrum_edges) / np.diff(np.append(self.spectrum_edges, len(band))) \
+            if self.spectrum_bins else np.zeros(0)
+
+        # résultats du message en cours, alloués une fois
+        channels = capture.channels
+        self.batch = batch
+        self.count = 0
+        self.seq = 0 # numéro du premier tick du message en cours
+        self.times = np.zeros(batch)
+        self.freqs = np.zeros((batch, channels), dtype=np.float32)
+        self.confidences = np.zeros((batch, channels), dtype=np.float32)
+        self.notes = np.zeros((batch, channels), dtype=np.int8)
+        self.octaves = np.zeros((batch, channels), dtype=np.int8)
+        self.cents = np.zeros((batch, channels), dtype=np.float32)
+        self.spectrum = np.zeros((batch, channels, self.spectrum_bins), dtype=np.float32)
+
+    def hello(self):
+        return encode_frame(FRAME_HELLO, json.dumps({
+            'version': PROTOCOL_VERSION,
+            'rate': self.capture.rate,
+            'channels': self.capture.channels,
+            'window': self.window,
+            'hop': self.capture.chunk,
+            'min_freq': self.min_freq,
+            'max_freq': self.max_freq,
+            'estimator': self.estimator.name if self.estimator else 'fft',
+            'a4': self.note_table.a4,
+            'note_names': self.note_table.names,
+            'batch': self.batch,
+            'spectrum_freqs': [round(float(freq), 2) for freq in self.spectrum_freqs],
+        }).encode())
+
+    def analyse(self, data):
+        # data: (channels, window) entiers 16 bits; toutes les fenêtres des canaux en un seul appel
+        data = data.astype(np.float64)
+        spectra = self.plan.spectrum(data)
+        if self.estimator is None:
+            # même confiance que FftPeakEstimator, sans refaire la FFT
+            freqs, amps = find_peak(self.plan, spectra)
+            confidences = amps / (spectra[..., self.plan.band].sum(axis=-1) + 1e-12)
+        else:
+            freqs, confidences = self.estimator.estimate(data, self.capture.rate)
+
+        i = self.count
+        self.times[i] = self.capture.read_pos / self.capture.rate # fin de la fenêtre, en s depuis le début de la capture
+        self.freqs[i] = freqs
+        self.confidences[i] = confidences
+        self.notes[i], self.octaves[i], self.cents[i] = self.note_table.map(freqs)
+        if self.spectrum_bins:
+            self.spectrum[i] = np.maximum.reduceat(spectra[..., self.plan.band], self.spectrum_edges, axis=-1)
+        self.count += 1
+        if self.count == self.batch:
+            self.flush()
+
+    def flush(self):
+        if self.count == 0:
+            return
+        n = self.count
+        payload = b''.join([RESULTS_HEADER.pack(self.seq, n, self.freqs.shape[1], self.spectrum_bins),
+                            self.times[:n].tobytes(), self.freqs[:n].tobytes(), self.confidences[:n].tobytes(),
+                            self.notes[:n].tobytes(), self.octaves[:n].tobytes(), self.cents[:n].tobytes(),
+                            self.spectrum[:n].tobytes()])
+        self.seq += n
+        self.count = 0
+        self.publish(encode_frame(FRAME_RESULTS, payload))
+
+class Client:
+    def __init__(self, sock, hello, max_frames):
+        self.sock = sock
+        self.frames = collections.deque() # messages pas encore envoyés (partagés avec les autres clients, jamais copiés)
+        self.max_frames = max_frames
+        self.pending = hello # octets en cours d'envoi: un message commencé est toujours envoyé en entier
+        self.offset = 0
+        self.dropped = 0
+        self.reported = 0 # valeur de dropped déjà envoyée au client
+        self.events = selectors.EVENT_READ
+
+    def push(self, frame):
+        # appelé par le thread d'analyse (verrou du serveur pris): ne bloque jamais
+        if len(self.frames) >= self.max_frames:
+            self.frames.popleft()
+            self.dropped += 1
+        self.frames.append(frame)
+
+    def send(self, lock):
+        # envoie tout ce qui peut l'être sans attendre; BlockingIOError quand la socket du client est pleine
+        while True:
+            if self.offset >= len(self.pending):
+                with lock:
+                    if not self.frames:
+                        self.pending, self.offset = b'', 0
+                        return
+                    frames = list(self.frames) # tous les messages en attente en un seul envoi
+                    self.frames.clear()
+                    if self.dropped != self.reported:
+                        frames.insert(0, encode_frame(FRAME_DROPPED, DROPPED.pack(self.dropped)))
+                        self.reported = self.dropped
+                self.pending, self.offset = b''.join(frames), 0
+            self.offset += self.sock.send(memoryview(self.pending)[self.offset:])
+
+    @property
+    def waiting(self):
+        return self.offset < len(self.pending) or bool(self.frames)
+
+class StreamServer:
+    # tcp: (hôte, port), unix: chemin de la socket; hello: premier message envoyé à chaque client
+    def __init__(self, tcp=None, unix=None, hello=b'', max_frames=64):
+        self.hello = hello
+        self.max_frames = max_frames
+        self.selector = selectors.DefaultSelector()
+        self.clients = {}
+        self.lock = threading.Lock()
+        self.listeners = []
+        self.unix_path = unix
+        self.sent_frames = 0
+        self.connections = 0
+        self.lost_frames = 0 # messages perdus par les clients déjà déconnectés
+
+        if tcp:
+            # https://docs.python.org/3/library/socket.html#socket.create_server
+            self.listeners.append(socket.create_server(tcp))
+        if unix:
+            if os.path.exists(unix): # socket laissée par un serveur précédent
+                os.unlink(unix)
+            listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            listener.bind(unix)
+            listener.listen()
+            self.listeners.append(listener)
+        for listener in self.listeners:
+            listener.setblocking(False)
+            self.selector.register(listener, selectors.EVENT_READ, 'accept')
+
+        # réveil du thread d'envoi quand un message est publié (select attend sur les sockets)
+        self.wake_r, self.wake_w = socket.socketpair()
+        self.wake_r.setblocking(False)
+        self.wake_w.setblocking(False)
+        self.selector.register(self.wake_r, selectors.EVENT_READ, 'wake')
+
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="StreamServer", daemon=True)
+        self.thread.start()
+
+    @property
+    def address(self):
+        return [listener.getsockname() for listener in self.listeners]
+
+    def publish(self, frame):
+        with self.lock:
+            for client in self.clients.values():
+                client.push(frame)
+        self.sent_frames += 1
+        self.wake()
+
+    def wake(self):
+        try:
+            self.wake_w.send(b'\0')
+        except BlockingIOError:
+            pass # déjà réveillé
+
+    @property
+    def dropped_frames(self):
+        with self.lock:
+            return self.lost_frames + sum(client.dropped for client in self.clients.values())
+
+    def run(self):
+        while self.running:
+            # écriture surveillée seulement pour les clients qui ont quelque chose à recevoir
+            with self.lock:
+                clients = list(self.clients.values())
+            for client in clients:
+                events = selectors.EVENT_READ | (selectors.EVENT_WRITE if client.waiting else 0)
+                if events != client.events:
+                    self.selector.modify(client.sock, events, client)
+                    client.events = events
+
+            for key, events in self.selector.select(timeout=0.5):
+                if key.data == 'accept':
+                    self.accept(key.fileobj)
+                elif key.data == 'wake':
+                    try:
+                        while key.fileobj.recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                else:
+                    self.serve(key.data, events)
+
+    def accept(self, listener):
+        try:
+            sock, _ = listener.accept()
+        except BlockingIOError:
+            return
+        sock.setblocking(False)
+        client = Client(sock, self.hello, self.max_frames)
+        with self.lock:
+            self.clients[sock] = client
+        self.selector.register(sock, client.events, client)
+        self.connections += 1
+
+    def serve(self, client, events):
+        try:
+            if events & selectors.EVENT_READ:
+                # les clients n'envoient rien: des données vides signalent la fermeture de la connexion
+                if not client.sock.recv(4096):
+                    self.disconnect(client)
+                    return
+            if events & selectors.EVENT_WRITE:
+                client.send(self.lock)
+        except BlockingIOError:
+            pass
+        except OSError: # connexion coupée par le client
+            self.disconnect(client)
+
+    def disconnect(self, client):
+        with self.lock:
+            self.clients.pop(client.sock, None)
+            self.lost_frames += client.dropped
+        self.selector.unregister(client.sock)
+        client.sock.close()
+
+    def close(self, linger=1.0):
+        # laisse au plus 'linger' s aux clients pour recevoir les derniers messages
+        deadline = time.monotonic() + linger
+        while time.monotonic() < deadline:
+            with self.lock:
+                if not any(client.waiting for client in self.clients.values()):
+                    break
+            time.sleep(0.01)
+        self.running = False
+        self.wake()
+        self.thread.join()
+        for key in list(self.selector.get_map().values()):
+            key.fileobj.close()
+        self.selector.close()
+        self.wake_w.close()
+        if self.unix_path and os.path.exists(self.unix_path):
+            os.unlink(self.unix_path)
+
+def run(capture, analyser, fast=False):
+    # fast: la source est lue bloc par bloc par cette boucle, sans sauter aucun tick, aussi vite que possible;
+    # sinon la capture avance seule (micro ou source en temps réel) et on analyse dès qu'un bloc est arrivé
+    window = analyser.window
+    if fast:
+        while capture.stream.step():
+            capture.dispatch(window)
+    else:
+        period = capture.chunk / capture.rate
+        last = capture.ring.write_pos
+        while capture.stream.is_active():
+            if capture.ring.write_pos == last:
+                time.sleep(period / 4)
+                continue
+            last = capture.ring.write_pos
+            capture.dispatch(window)
+    analyser.flush()
+
+def run_client(address, out=sys.stdout):
+    # client minimal: une ligne par tick (instant, puis fréquence, note et écart en cents de chaque canal)
+    family, target = parse_address(address)
+    with socket.socket(family, socket.SOCK_STREAM) as sock:
+        sock.connect(target)
+        names = None
+        for kind, payload in read_frames(sock):
+            if kind == FRAME_HELLO:
+                hello = json.loads(payload)
+                names = hello['note_names']
+                out.write(f"# {hello['rate']} Hz, {hello['channels']} canal(aux), fenêtre {hello['window']}, hop {hello['hop']}\n")
+            elif kind == FRAME_DROPPED:
+                out.write(f"# {DROPPED.unpack(payload)[0]} messages perdus\n")
+            elif kind == FRAME_RESULTS:
+                result = decode_results(payload)
+                for t, freqs, notes, octaves, cents in zip(result['times'], result['freqs'], result['notes'], result['octaves'], result['cents']):
+                    columns = [f"{freq:8.2f} Hz {names[note]}{octave} {cent:+4.0f}c" if note >= 0 else f"{'-':>8s}"
+                               for freq, note, octave, cent in zip(freqs, notes, octaves, cents)]
+                    out.write(f"{t:9.3f}  " + "  ".join(columns) + "\n")
+            out.flush()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyse en direct sans interface, résultats publiés sur une socket locale.")
+    parser.add_argument('--source', help="entrée à la place du micro: fichier WAV, tone:FRÉQ, sweep:DÉBUT-FIN ou noise")
+    parser.add_argument('--fast', action='store_true', help="relire la source aussi vite que possible (sans sauter aucun bloc)")
+    parser.add_argument('--duration', type=float, help="durée (s) des signaux synthétiques (par défaut: sans fin)")
+    parser.add_argument('--tcp', metavar='HÔTE:PORT', help="adresse TCP d'écoute (par défaut: 127.0.0.1:5555 si pas de --unix)")
+    parser.add_argument('--unix', metavar='CHEMIN', help="socket Unix d'écoute")
+    parser.add_argument('--client', metavar='ADRESSE', help="se connecter à un serveur (HÔTE:PORT ou chemin) et afficher les résultats")
+    parser.add_argument('--channels', type=int, default=1)
+    parser.add_argument('--min-freq', type=int, default=250)
+    parser.add_argument('--max-freq', type=int, default=1100)
+    parser.add_argument('--window', type=int, default=4096, help="taille de la fenêtre analysée")
+    parser.add_argument('--hop', type=int, default=1024, help="échantillons entre deux analyses")
+    parser.add_argument('--pitch', choices=sorted(ESTIMATORS), default='fft', help="estimateur de la fondamentale")
+    parser.add_argument('--spectrum', type=int, default=0, metavar='BINS', help="publier aussi le spectre réduit à BINS valeurs")
+    parser.add_argument('--batch', type=int, default=4, help="ticks regroupés par message")
+    parser.add_argument('--max-frames', type=int, default=64, help="messages gardés au plus pour un client lent")
+    parser.add_argument('--a4', type=float, default=440.0, help="fréquence de référence du La4 en Hz")
+    parser.add_argument('--notes', choices=['fr', 'en'], default='fr', help="noms des notes: fr (Do Ré Mi) ou en (C D E)")
+    args = parser.parse_args(argv)
+
+    if args.client:
+        try:
+            run_client(args.client)
+        except KeyboardInterrupt:
+            pass
+        return
+    if args.fast and not args.source:
+        parser.error("--fast demande une --source")
+
+    if args.source:
+        source = parse_source(args.source, channels=args.channels, duration=args.duration)
+        audio = SourceBackend(source, realtime=not args.fast, threaded=not args.fast)
+        rate = source.rate
+    else:
+        import pyaudio # importé ici: seul le micro a besoin de PyAudio
+        audio = pyaudio.PyAudio()
+        rate = 44100
+
+    capture = CaptureEngine(audio, rate=rate, channels=args.channels, chunk=args.hop, buffer_chunks=max(32, 2 * args.window // args.hop))
+    tcp = parse_address(args.tcp or '127.0.0.1:5555')[1] if args.tcp or not args.unix else None
+    # l'analyseur est construit avant le serveur: un client accepté dès l'ouverture reçoit déjà le bon HELLO
+    # (publish n'est appelé qu'à partir du premier tick, une fois le serveur créé)
+    analyser = LiveAnalyser(capture, None, window=args.window, min_freq=args.min_freq, max_freq=args.max_freq,
+                            estimator=None if args.pitch == 'fft' else args.pitch, spectrum_bins=args.spectrum,
+                            batch=args.batch, a4=args.a4, note_names=args.notes)
+    server = StreamServer(tcp=tcp, unix=args.unix, hello=analyser.hello(), max_frames=args.max_frames)
+    analyser.publish = server.publish
+    capture.subscribe(analyser.analyse)
+    print(f"Écoute sur {', '.join(map(str, server.address))}", file=sys.stderr)
+
+    capture.start()
+    try:
+        run(capture, analyser, fast=args.fast)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        capture.close()
+        server.close()
+        audio.terminate()
+        print(f"{analyser.seq} ticks analysés, {server.sent_frames} messages publiés, {server.connections} connexions, "
+              f"{server.dropped_frames} messages perdus par des clients lents", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import threading, time, numpy as np
+from decode import FULL_SCALE
+from wavstream import MappedWav
+
+# sources d'entrée qui remplacent le micro: relecture d'un fichier WAV ou signal synthétique (sinusoïde,
+# balayage, bruit). SourceBackend a la même interface que pyaudio.PyAudio pour ce dont CaptureEngine a besoin
+# (open, get_default_input_device_info, terminate): la capture et toute l'analyse en direct tournent donc
+# sans carte son, en temps réel ou aussi vite que possible (tests de régression, mesures de latence).
+#
+# une source a .rate, .channels et read(frames) -> tableau int16 (frames, channels), moins de frames à la fin
+# (tableau vide: source terminée)
+
+class WavInput:
+    def __init__(self, path, loop=False):
+        self.wav = MappedWav(path)
+        self.rate = self.wav.rate
+        self.channels = self.wav.channels
+        self.loop = loop
+        self.pos = 0
+
+    def read(self, frames):
+        if self.loop and self.pos >= self.wav.num_frames:
+            self.pos = 0
+        samples = self.wav.read(self.pos, frames)
+        self.pos += len(samples)
+        if self.wav.sampwidth != 2: # ramené sur 16 bits, comme ce que donne le micro
+            samples = (samples.astype(np.int64) * 2**15 // FULL_SCALE[self.wav.sampwidth]).astype(np.int16)
+        return samples
+
+class SyntheticInput:
+    # kind: 'tone' (sinusoïde à freq), 'sweep' (balayage logarithmique de freq à end_freq en duration s)
+    # ou 'noise' (bruit blanc); noise ajoute du bruit blanc aux deux premiers. même signal sur tous les canaux
+    def __init__(self, kind='tone', freq=440, end_freq=None, duration=None, amplitude=0.3, noise=0.0, rate=44100, channels=1, seed=0):
+        if kind == 'sweep' and (not end_freq or not duration):
+            raise ValueError("Un balayage demande une fréquence de fin et une durée.")
+        self.kind = kind
+        self.freq = freq
+        self.end_freq = end_freq
+        self.duration = duration
+        self.amplitude = amplitude
+        self.noise = noise
+        self.rate = rate
+        self.channels = channels
+        self.rng = np.random.default_rng(seed) # graine fixe: deux exécutions donnent exactement le même signal
+        self.pos = 0
+
+    def read(self, frames):
+        if self.duration is not None:
+            frames = max(0, min(frames, int(self.duration * self.rate) - self.pos))
+        t = (self.pos + np.arange(frames)) / self.rate
+        self.pos += frames
+
+        if self.kind == 'tone':
+            signal = self.amplitude * np.sin(2 * np.pi * self.freq * t)
+        elif self.kind == 'sweep':
+            # https://en.wikipedia.org/wiki/Chirp#Exponential (phase = intégrale de la fréquence instantanée)
+            k = np.log(self.end_freq / self.freq)
+            signal = self.amplitude * np.sin(2 * np.pi * self.freq * self.duration / k * np.expm1(k * t / self.duration))
+        elif self.kind == 'noise':
+            signal = self.amplitude * self.rng.standard_normal(frames)
+        else:
+            raise ValueError(f"Type de signal inconnu: {self.kind}")
+        if self.noise:
+            signal = signal + self.noise * self.rng.standard_normal(frames)
+
+        samples = np.clip(signal * 2**15, -2**15, 2**15 - 1).astype(np.int16)
+        return np.repeat(samples[:, None], self.channels, axis=1)
+
+def parse_source(spec, rate=44100, channels=1, duration=None):
+    # 'fichier.wav', 'tone:440', 'sweep:200-2000' ou 'noise'; duration en s pour les signaux synthétiques
+    # (None: sans fin, sauf le balayage qui dure 10 s par défaut)
+    kind, _, value = spec.partition(':')
+    if kind == 'tone':
+        return SyntheticInput('tone', float(value or 440), duration=duration, rate=rate, channels=channels)
+    if kind == 'sweep':
+        start, _, end = (value or '200-2000').partition('-')
+        return SyntheticInput('sweep', float(start), float(end), duration=duration or 10, rate=rate, channels=channels)
+    if kind == 'noise':
+        return SyntheticInput('noise', duration=duration, rate=rate, channels=channels)
+    return WavInput(spec)
+
+class SourceStream:
+    # équivalent d'un flux d'entrée PyAudio en mode callback: le callback reçoit des blocs de frames_per_buffer
+    # frames entrelacées (octets int16). threaded=True: un thread appelle le callback au rythme du son (ou aussi
+    # vite que possible si realtime=False); threaded=False: c'est l'appelant qui avance bloc par bloc avec step()
+    def __init__(self, source, channels, frames_per_buffer, stream_callback, realtime=True, threaded=True):
+        self.source = source
+        self.channels = channels
+        self.frames_per_buffer = frames_per_buffer
+        self.callback = stream_callback
+        self.realtime = realtime
+        self.threaded = threaded
+        self.active = False
+        self.finished = False
+        self.thread = None
+        self.next_time = None # instant prévu pour le prochain bloc (mode temps réel)
+
+    def step(self):
+        # un bloc de la source vers le callback; renvoie False quand la source est terminée
+        samples = self.source.read(self.frames_per_buffer)
+        if len(samples) == 0:
+            self.finished = True
+            self.active = False
+            return False
+        if self.realtime:
+            now = time.monotonic()
+            self.next_time = max(self.next_time or now, now - 0.1) # après une longue pause, on ne rattrape pas tout
+            if self.next_time > now:
+                time.sleep(self.next_time - now)
+            self.next_time += len(samples) / self.source.rate
+        data = np.ascontiguousarray(samples[:, :self.channels]).tobytes()
+        self.callback(data, len(samples), {}, 0)
+        return True
+
+    def run(self):
+        while self.active and self.step():
+            pass
+
+    def start_stream(self):
+        if self.active or self.finished:
+            return
+        self.active = True
+        self.next_time = None
+        if self.threaded:
+            self.thread = threading.Thread(target=self.run, name="SourceStream", daemon=True)
+            self.thread.start()
+
+    def stop_stream(self):
+        self.active = False
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
+
+    def is_active(self):
+        return self.active
+
+    def close(self):
+        self.stop_stream()
+
+class SourceBackend:
+    # à passer à CaptureEngine à la place de pyaudio.PyAudio()
+    def __init__(self, source, realtime=True, threaded=True):
+        self.source = source
+        self.realtime = realtime
+        self.threaded = threaded
+        self.stream = None
+
+    def open(self, format=None, channels=1, rate=44100, frames_per_buffer=1024, input=True, stream_callback=None, start=True):
+        if rate != self.source.rate:
+            raise ValueError(f"La source est à {self.source.rate} Hz, pas à {rate} Hz.")
+        if channels > self.source.channels:
+            raise ValueError(f"La source n'a que {self.source.channels} canal(aux).")
+        self.stream = SourceStream(self.source, channels, frames_per_buffer, stream_callback, self.realtime, self.threaded)
+        if start:
+            self.stream.start_stream()
+        return self.stream
+
+    def get_default_input_device_info(self):
+        return {'maxInputChannels': self.source.channels, 'defaultSampleRate': self.source.rate}
+
+    def terminate(self):
+        if self.stream is not None:
+            self.stream.close()
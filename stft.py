@@ -0,0 +1,68 @@
+import numpy as np
+from analyse import get_plan, get_zoom_plan
+from decimation import StreamingDecimator
+
+# FFT glissante (STFT) sur le flux en direct: une fenêtre de 'window' échantillons avance de 'hop' échantillons
+# à chaque nouvelle trame. les fenêtres se chevauchent (window - hop échantillons en commun) et ne sont jamais
+# recopiées: ce sont des vues sur un tampon linéaire où les nouveaux échantillons sont ajoutés à la suite.
+# le coût est donc fixe par hop (une FFT de 'window' points), et plus le hop est petit, plus le spectre est fluide.
+# les canaux sont traités ensemble: le tampon a une ligne par canal et les FFT de tous les canaux sont faites d'un coup.
+# avec un décimateur, le flux est décimé au fil de l'eau avant le tampon (window et hop comptent alors des
+# échantillons décimés); avec une résolution, les spectres sont calculés par la zoom FFT (chirp-z) sur la bande.
+
+class SlidingStft:
+    def __init__(self, window=2048, hop=512, window_function='hann', capacity_hops=32, channels=1, decimator=None):
+        self.decimator = StreamingDecimator(decimator, channels) if decimator else None
+        self.window = window
+        self.hop = hop
+        self.window_function = window_function
+        # le tampon contient une fenêtre plus capacity_hops hops: on ne le compacte (copie des window derniers
+        # échantillons au début) qu'une fois tous les capacity_hops hops
+        self.buffer = np.zeros((channels, window + capacity_hops * hop))
+        self.end = 0 # nombre d'échantillons valides dans le tampon
+        self.next_frame = 0 # début, dans le tampon, de la prochaine trame à calculer
+        self.frames_done = 0 # nombre de trames calculées depuis le début (pour les instants)
+        self.last_frame = None # copie de la trame la plus récente (channels, window), pour les estimateurs de pitch.py
+
+    def push(self, samples, rate, min_freq, max_freq, resolution=None):
+        # ajoute les nouveaux échantillons (channels, n) et renvoie
+        # (plan, instants en s, spectres des nouvelles trames complètes de forme (channels, trames, bins))
+        # rate est le taux du flux reçu; le plan (et les instants) utilisent le taux après décimation
+        samples = np.asarray(samples, dtype=np.float64).reshape(len(self.buffer), -1)
+        if self.decimator:
+            samples, rate = self.decimator.push(samples), self.decimator.rate
+        if resolution:
+            plan = get_zoom_plan(self.window, rate, min_freq, max_freq, resolution, self.window_function)
+        else:
+            plan = get_plan(self.window, rate, min_freq, max_freq, self.window_function)
+        spectra, times = [], []
+        size = self.buffer.shape[-1]
+        while samples.shape[-1] > 0:
+            if self.end == size: # tampon plein: on ne garde que ce qui sert encore
+                # avec hop > window, la prochaine trame peut commencer après la fin du tampon: rien n'est gardé
+                # et les échantillons d'ici là seront sautés à leur arrivée (next_frame reste au-delà de end)
+                shift = min(self.next_frame, self.end)
+                kept = self.end - shift
+                self.buffer[:, :kept] = self.buffer[:, shift:self.end]
+                self.end, self.next_frame = kept, self.next_frame - shift
+
+            taken = min(samples.shape[-1], size - self.end)
+            self.buffer[:, self.end:self.end + taken] = samples[:, :taken]
+            self.end += taken
+            samples = samples[:, taken:]
+
+            available = self.end - self.next_frame
+            if available < self.window:
+                continue
+            count = (available - self.window) // self.hop + 1
+            # https://numpy.org/doc/stable/reference/generated/numpy.lib.stride_tricks.sliding_window_view.html
+            frames = np.lib.stride_tricks.sliding_window_view(self.buffer[:, self.next_frame:self.end], self.window, axis=-1)[:, ::self.hop][:, :count]
+            spectra.append(plan.spectrum(frames))
+            self.last_frame = frames[:, -1].copy() # le tampon peut être compacté par les échantillons suivants
+            times.append((self.frames_done + np.arange(count)) * self.hop / rate)
+            self.next_frame += count * self.hop
+            self.frames_done += count
+
+        if not spectra:
+            return plan, np.empty(0), np.empty((len(self.buffer), 0, len(plan.freqs)))
+        return plan, np.concatenate(times), np.concatenate(spectra, axis=1)
@@ -0,0 +1,119 @@
+import os, struct, numpy as np
+from decode import decode_pcm
+from analyse import get_plan, find_peak, candidate_stats
+
+# analyse d'un fichier WAV par petits morceaux: le fichier est projeté en mémoire (memmap), seules les pages
+# lues sont chargées par le système, et on calcule une FFT courte (STFT) fenêtre par fenêtre.
+# la mémoire utilisée reste la même que le fichier fasse 10 s ou 2 h.
+
+class MappedWav:
+    # https://docs.fileformat.com/audio/wav/
+    # un fichier WAV est une suite de chunks RIFF: 'fmt ' décrit le format, 'data' contient les échantillons
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            riff, _, wave_id = struct.unpack('<4sI4s', f.read(12))
+            if riff != b'RIFF' or wave_id != b'WAVE':
+                raise ValueError("Ce fichier n'est pas un fichier WAV.")
+
+            fmt = None
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    raise ValueError("Le fichier WAV ne contient pas de données audio.")
+                chunk_id, chunk_size = struct.unpack('<4sI', header)
+                if chunk_id == b'fmt ':
+                    fmt_data = f.read(chunk_size + (chunk_size & 1)) # les chunks sont alignés sur 2 octets
+                    fmt = struct.unpack('<HHIIHH', fmt_data[:16])
+                elif chunk_id == b'data':
+                    offset = f.tell()
+                    break
+                else:
+                    f.seek(chunk_size + (chunk_size & 1), 1) # chunk inconnu (LIST, fact...): on le saute
+
+        if fmt is None:
+            raise ValueError("Le fichier WAV n'a pas de chunk 'fmt '.")
+        audio_format, self.channels, self.rate, _, _, bits = fmt
+        if audio_format == 0xFFFE and len(fmt_data) >= 26:
+            # WAVE_FORMAT_EXTENSIBLE: le vrai format est dans les 2 premiers octets du GUID SubFormat (octets 24 à 40)
+            # https://learn.microsoft.com/en-us/windows/win32/api/mmreg/ns-mmreg-waveformatextensible
+            audio_format = struct.unpack('<H', fmt_data[24:26])[0]
+        if audio_format != 1: # 1 = PCM (3 = flottant IEEE, ...)
+            raise ValueError(f"Format WAV non supporté: {audio_format} (seul le PCM est supporté).")
+        self.sampwidth = bits // 8
+
+        # un enregistrement interrompu peut annoncer une taille fausse: on se limite à ce qui est vraiment sur le disque
+        frame_size = self.sampwidth * self.channels
+        data_size = min(chunk_size, os.path.getsize(path) - offset)
+        self.num_frames = data_size // frame_size
+        if self.num_frames == 0:
+            raise ValueError("Le fichier WAV ne contient aucun échantillon.")
+
+        # https://numpy.org/doc/stable/reference/generated/numpy.memmap.html
+        self.data = np.memmap(path, dtype=np.uint8, mode='r', offset=offset, shape=(self.num_frames * frame_size,))
+
+    def read(self, start, count):
+        # décode les frames [start, start + count) sous forme d'un tableau (frames, channels)
+        frame_size = self.sampwidth * self.channels
+        start = max(0, start)
+        end = min(self.num_frames, start + count)
+        return decode_pcm(self.data[start * frame_size:end * frame_size], self.sampwidth, self.channels)
+
+    @property
+    def duration(self):
+        return self.num_frames / self.rate
+
+def stft_plan(rate, min_freq, max_freq, window, decimator=None):
+    # plan de la FFT courte (fenêtre de Hann: limite les fuites spectrales entre fenêtres voisines);
+    # après décimation, la fenêtre contient factor fois moins d'échantillons pour la même durée
+    if decimator is not None:
+        return get_plan(window // decimator.factor, decimator.rate, min_freq, max_freq, 'hann')
+    return get_plan(window, rate, min_freq, max_freq, 'hann')
+
+def stft_frame_count(num_frames, window, hop):
+    # nombre de fenêtres analysées (au moins une, complétée par du silence si le fichier est trop court)
+    return max(1, 1 + (num_frames - window) // hop)
+
+def stft_pitch(wav, min_freq, max_freq, window=4096, hop=2048, block=64, decimator=None):
+    # générateur: à chaque itération, analyse 'block' fenêtres de tous les canaux et renvoie
+    # (instants en s, fondamentales en Hz (channels, fenêtres) (nan si rien au-dessus du bruit),
+    #  somme des spectres (channels, bins), nombre de fenêtres)
+    # tous les canaux passent par les mêmes opérations (décimation, FFT, pics) sur des tableaux (channels, ...):
+    # une seule FFT en lot au lieu d'une boucle sur les canaux
+    num_windows = stft_frame_count(wav.num_frames, window, hop)
+    plan = stft_plan(wav.rate, min_freq, max_freq, window, decimator)
+    factor = decimator.factor if decimator else 1
+    history = decimator.history if decimator else 0 # échantillons d'avant le bloc nécessaires au filtre
+
+    for first in range(0, num_windows, block):
+        count = min(block, num_windows - first)
+        span = (count - 1) * hop + window
+        start = first * hop - history
+        # (frames, channels) -> (channels, frames): vue transposée, le temps sur le dernier axe
+        samples = wav.read(max(0, start), span + history - max(0, -start)).T.astype(np.float64)
+        # début du fichier (pas d'historique) ou fichier plus court qu'une fenêtre: on complète avec du silence
+        samples = np.pad(samples, ((0, 0), (max(0, -start), span + history - max(0, -start) - samples.shape[-1])))
+        if decimator is not None:
+            samples = decimator.decimate(samples)
+
+        # https://numpy.org/doc/stable/reference/generated/numpy.lib.stride_tricks.sliding_window_view.html
+        # vue (channels, count, window) sur les fenêtres qui se chevauchent, sans recopier les échantillons
+        starts = np.arange(count) * hop // factor
+        frames = np.lib.stride_tricks.sliding_window_view(samples, plan.length, axis=-1)[:, starts]
+        spectra = plan.spectrum(frames)
+
+        # même critère que l'analyse en direct (pic au-dessus de 3 fois le bruit moyen), avec interpolation entre bins
+        pitches, _ = find_peak(plan, spectra)
+
+        times = (np.arange(first, first + count) * hop + window / 2) / wav.rate # centre de chaque fenêtre
+        yield times, pitches, spectra.sum(axis=1), count
+
+def spectrum_fundamentals(plan, spectra):
+    # fondamentale du spectre moyen de chaque canal: moyenne des fréquences au-dessus de 3 fois le bruit
+    # (comme analyse_spectrum), None pour un canal sans fréquence détectée
+    sums, counts = candidate_stats(plan, spectra)
+    return [float(total / count) if count > 0 else None for total, count in zip(sums, counts)]
+
+def stft_params(rate, min_freq, max_freq, window, hop, decimator=None):
+    # tout ce dont dépend le résultat de stft_pitch (en plus du contenu du fichier): sert de clé au cache
+    return {'rate': rate, 'min_freq': min_freq, 'max_freq': max_freq, 'window': window, 'hop': hop,
+            'engine': f"stft-decimation-{decimator.factor}" if decimator else 'stft', 'channels': 'all'}